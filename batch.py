@@ -0,0 +1,151 @@
+import argparse
+import glob
+import json
+import multiprocessing
+import os
+import sys
+import time
+import traceback
+from collections import Counter
+
+# Worker không được in banner pygame vào giữa báo cáo
+os.environ.setdefault('PYGAME_HIDE_SUPPORT_PROMPT', '1')
+
+from headless import HeadlessGame
+from main import DEFAULT_MAP
+
+# Trường của mỗi ván được giữ trong báo cáo (bỏ 'path' cho gọn)
+GAME_FIELDS = ('map', 'seed', 'outcome', 'won', 'frames', 'steps', 'plans', 'total_cost',
+               'food_left', 'planning_time', 'max_plan_time', 'worst_bound', 'wall_time')
+
+
+def parse_seeds(text):
+    """'1-100' -> 1..100, '1,5,9' -> [1, 5, 9], có thể trộn: '1-3,10'."""
+    seeds = []
+    for part in text.split(','):
+        part = part.strip()
+        if not part:
+            continue
+        if '-' in part:
+            lo, hi = part.split('-', 1)
+            seeds.extend(range(int(lo), int(hi) + 1))
+        else:
+            seeds.append(int(part))
+    return seeds
+
+
+def expand_maps(patterns):
+    maps = []
+    for pattern in patterns:
+        matches = sorted(glob.glob(pattern))
+        if not matches:
+            raise ValueError(f"no map matches {pattern!r}")
+        maps.extend(matches)
+    return maps
+
+
+def run_game(job):
+    """Chạy một ván trong worker: mỗi ván tự dựng Maze, PacmanSearchProblem và ma riêng."""
+    map_path, seed, max_steps, time_budget, node_budget = job
+    try:
+        game = HeadlessGame(map_path, seed=seed, plan_time_budget=time_budget,
+                            plan_node_budget=node_budget)
+        result = game.run(max_steps=max_steps)
+    except Exception:
+        return {'map': map_path, 'seed': seed, 'outcome': 'error', 'won': False,
+                'error': traceback.format_exc(limit=3)}
+    return {field: result.get(field) for field in GAME_FIELDS}
+
+
+def summarize(games):
+    """Gộp các ván (cùng map hoặc tất cả) thành số liệu tổng."""
+    played = [g for g in games if g['outcome'] != 'error']
+    n = len(played)
+
+    def mean(field):
+        values = [g[field] for g in played if g.get(field) is not None]
+        return round(sum(values) / len(values), 6) if values else None
+
+    return {
+        'games': len(games),
+        'wins': sum(1 for g in games if g['won']),
+        'win_rate': round(sum(1 for g in games if g['won']) / len(games), 4) if games else None,
+        'outcomes': dict(Counter(g['outcome'] for g in games)),
+        'mean_steps': mean('steps'),
+        'mean_cost': mean('total_cost'),
+        'mean_planning_time': mean('planning_time'),
+        'max_plan_time': max((g['max_plan_time'] for g in played if g.get('max_plan_time') is not None),
+                             default=None),
+        'total_planning_time': round(sum(g['planning_time'] for g in played), 6) if n else None,
+    }
+
+
+def evaluate(maps, seeds, workers=None, max_steps=10000, time_budget=None, node_budget=None,
+             progress=None):
+    """Chạy mọi cặp (map, seed) trên một multiprocessing.Pool, trả về báo cáo dạng dict."""
+    jobs = [(map_path, seed, max_steps, time_budget, node_budget) for map_path in maps for seed in seeds]
+    started = time.perf_counter()
+    games = []
+    with multiprocessing.Pool(processes=workers) as pool:
+        for game in pool.imap_unordered(run_game, jobs):
+            games.append(game)
+            if progress:
+                progress(len(games), len(jobs), game)
+    games.sort(key=lambda g: (g['map'], g['seed']))
+
+    return {
+        'config': {
+            'maps': maps,
+            'seeds': seeds,
+            'workers': workers or os.cpu_count(),
+            'max_steps': max_steps,
+            'plan_time_budget': time_budget,
+            'plan_node_budget': node_budget,
+        },
+        'wall_time': round(time.perf_counter() - started, 3),
+        'overall': summarize(games),
+        'per_map': {map_path: summarize([g for g in games if g['map'] == map_path]) for map_path in maps},
+        'games': games,
+    }
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Chạy hàng loạt ván headless trên nhiều map / seed song song.")
+    parser.add_argument('--maps', nargs='+', default=[DEFAULT_MAP], help="file map hoặc glob (vd. 'maps/*.txt')")
+    parser.add_argument('--seeds', default='1-20', help="seed: '1-100', '1,5,9' ...")
+    parser.add_argument('--workers', type=int, default=None, help="số process (mặc định = số CPU)")
+    parser.add_argument('--max-steps', type=int, default=10000, help="số frame tối đa mỗi ván")
+    parser.add_argument('--plan-budget-ms', type=float, default=None, help="giới hạn thời gian mỗi lần lập kế hoạch (ARA*)")
+    parser.add_argument('--node-budget', type=int, default=None, help="giới hạn số node mở rộng mỗi lần lập kế hoạch (ARA*)")
+    parser.add_argument('--output', default=None, help="ghi báo cáo JSON ra file")
+    parser.add_argument('--quiet', action='store_true', help="không in tiến độ từng ván")
+    args = parser.parse_args(argv)
+
+    maps = expand_maps(args.maps)
+    seeds = parse_seeds(args.seeds)
+    time_budget = args.plan_budget_ms / 1000 if args.plan_budget_ms is not None else None
+
+    def progress(done, total, game):
+        if not args.quiet:
+            print(f"[{done}/{total}] {game['map']} seed={game['seed']} {game['outcome']}", file=sys.stderr)
+
+    report = evaluate(maps, seeds, workers=args.workers, max_steps=args.max_steps,
+                      time_budget=time_budget, node_budget=args.node_budget, progress=progress)
+
+    for map_path, summary in report['per_map'].items():
+        print(f"{map_path}: {summary['wins']}/{summary['games']} wins, steps={summary['mean_steps']}, "
+              f"cost={summary['mean_cost']}, planning={summary['mean_planning_time']}s, "
+              f"outcomes={summary['outcomes']}")
+    overall = report['overall']
+    print(f"overall: {overall['wins']}/{overall['games']} wins ({overall['win_rate']}) "
+          f"in {report['wall_time']}s")
+
+    if args.output:
+        with open(args.output, 'w') as f:
+            json.dump(report, f, indent=2)
+    errors = overall['outcomes'].get('error', 0)
+    return 1 if errors else 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,197 @@
+import argparse
+import json
+import os
+import statistics
+import sys
+import tempfile
+import time
+import tracemalloc
+from types import SimpleNamespace
+
+os.environ.setdefault('PYGAME_HIDE_SUPPORT_PROMPT', '1')
+
+from maze import Maze, FOOD
+from ghost import GhostSwarm
+from search import PacmanSearchProblem, SearchStats, a_star_search, heuristic
+from main import DEFAULT_MAP
+from mapgen import generate_maze, write_map
+from mapcache import compiled_path
+
+BASELINE_PATH = 'benchmark_baseline.json'
+
+# Chỉ số tất định (không phụ thuộc máy bận hay rảnh), "càng nhỏ càng tốt": tệ hơn baseline
+# quá ngưỡng tương đối là regression
+COMPARED_METRICS = ['expanded', 'pushes', 'peak_frontier', 'peak_memory']
+# Thời gian (trung vị các lần lặp) nhiễu theo máy: chỉ cảnh báo, trừ khi chạy với --gate-timing
+TIME_METRICS = ['wall_time', 'setup_time', 'heuristic_time']
+# Chậm hơn baseline ít hơn mức này (giây) coi là nhiễu, dù vượt ngưỡng tương đối
+TIME_SLACK = 0.05
+HEURISTIC_CALLS = 200
+
+# (tên, file map hoặc tham số generate_maze, số food giữ lại (None = tất cả), ma: 'none' | 'map')
+SCENARIOS = [
+    ('example-food3-noghost', DEFAULT_MAP, 3, 'none'),
+    ('example-food5-noghost', DEFAULT_MAP, 5, 'none'),
+    ('example-all-noghost', DEFAULT_MAP, None, 'none'),
+    ('example-food5-ghosts', DEFAULT_MAP, 5, 'map'),
+    ('example-all-ghosts', DEFAULT_MAP, None, 'map'),
+    ('gen41-food6-noghost', dict(width=41, height=41, seed=1, loops=20, food=6, ghosts=2), None, 'none'),
+    ('gen101-food6-ghosts', dict(width=101, height=101, seed=2, loops=100, food=6, ghosts=8), None, 'map'),
+]
+
+_generated_maps = {}
+
+
+def scenario_map(spec):
+    """Đường dẫn map của kịch bản; map sinh ra (seed cố định) được ghi ra file tạm một lần."""
+    if isinstance(spec, str):
+        return spec
+    key = tuple(sorted(spec.items()))
+    if key not in _generated_maps:
+        fd, path = tempfile.mkstemp(prefix='pacman_bench_', suffix='.txt')
+        os.close(fd)
+        write_map(generate_maze(**spec), path)
+        _generated_maps[key] = path
+    return _generated_maps[key]
+
+
+def build_problem(map_path, food, ghosts):
+    """Dựng PacmanSearchProblem cố định cho một kịch bản (không cần Game / màn hình)."""
+    maze = Maze(map_path)
+    if food is not None:
+        for pos in maze.find_all(FOOD)[food:]:
+            maze.remove_food(pos)
+
+    world = SimpleNamespace(maze=maze, pacman=None)
+    positions = maze.find_all(ord('G')) if ghosts == 'map' else []
+    world.ghosts = GhostSwarm(world, positions)
+    maze.game = world
+    return PacmanSearchProblem(maze)
+
+
+def run_scenario(name, map_path, food, ghosts, repeat=5):
+    map_path = scenario_map(map_path)
+    setup_times = []
+    problem = None
+    for _ in range(repeat):
+        t0 = time.perf_counter()
+        problem = build_problem(map_path, food, ghosts)
+        setup_times.append(time.perf_counter() - t0)
+
+    start_state = problem.get_start_state()
+    heuristic_times = []
+    for _ in range(repeat):
+        t0 = time.perf_counter()
+        for _ in range(HEURISTIC_CALLS):
+            problem.mst_cache.clear()
+            heuristic(start_state, problem)
+        heuristic_times.append(time.perf_counter() - t0)
+
+    wall_times = []
+    stats = None
+    cost = None
+    for _ in range(repeat):
+        # Bảng khoảng cách giữ nguyên, cache MST làm lại từ đầu cho mỗi lần đo
+        problem.mst_cache.clear()
+        stats = SearchStats()
+        t0 = time.perf_counter()
+        path, cost = a_star_search(problem, return_cost=True, stats=stats)
+        wall_times.append(time.perf_counter() - t0)
+
+    problem.mst_cache.clear()
+    tracemalloc.start()
+    a_star_search(problem, return_cost=True)
+    _, peak_memory = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+
+    return {
+        'scenario': name,
+        'food': len(problem.food_cells(start_state)),
+        'ghosts': len(problem.maze.game.ghosts),
+        'wall_time': round(statistics.median(wall_times), 6),
+        'setup_time': round(statistics.median(setup_times), 6),
+        'heuristic_time': round(statistics.median(heuristic_times), 6),
+        'expanded': stats.expanded,
+        'pushes': stats.pushes,
+        'peak_frontier': stats.peak_frontier,
+        'peak_memory': peak_memory,
+        'cost': cost,
+        'path_length': len(path),
+    }
+
+
+def compare(results, baseline, threshold):
+    """Trả về (regressions, slower): các dòng mô tả chỉ số tất định tệ hơn baseline quá ngưỡng,
+    và các chỉ số thời gian chậm hơn cả ngưỡng tương đối lẫn TIME_SLACK."""
+    regressions = []
+    slower = []
+    for result in results:
+        base = baseline.get(result['scenario'])
+        if base is None:
+            continue
+        for metric in COMPARED_METRICS + TIME_METRICS:
+            old, new = base.get(metric), result[metric]
+            if not old or new <= old * (1 + threshold):
+                continue
+            if metric in TIME_METRICS:
+                if new - old >= TIME_SLACK:
+                    slower.append(f"{result['scenario']}: {metric} {old} -> {new} (+{(new / old - 1) * 100:.0f}%)")
+                continue
+            regressions.append(f"{result['scenario']}: {metric} {old} -> {new} (+{(new / old - 1) * 100:.0f}%)")
+        # Chi phí lời giải phải giữ nguyên hoặc tốt hơn
+        if base.get('cost') is not None and result['cost'] > base['cost']:
+            regressions.append(f"{result['scenario']}: cost {base['cost']} -> {result['cost']}")
+    return regressions, slower
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Benchmark planner A* trên các kịch bản cố định.")
+    parser.add_argument('--baseline', default=BASELINE_PATH, help="file baseline JSON")
+    parser.add_argument('--update-baseline', action='store_true', help="ghi kết quả lần chạy này làm baseline")
+    parser.add_argument('--threshold', type=float, default=0.25, help="mức tệ đi tối đa cho phép (0.25 = 25%%)")
+    parser.add_argument('--repeat', type=int, default=5, help="số lần lặp mỗi phép đo (lấy trung vị)")
+    parser.add_argument('--gate-timing', action='store_true',
+                        help="coi thời gian chậm hơn baseline (quá ngưỡng và TIME_SLACK) là regression")
+    parser.add_argument('--only', default=None, help="chỉ chạy các kịch bản có tên chứa chuỗi này")
+    args = parser.parse_args(argv)
+
+    results = []
+    for name, map_path, food, ghosts in SCENARIOS:
+        if args.only and args.only not in name:
+            continue
+        result = run_scenario(name, map_path, food, ghosts, repeat=args.repeat)
+        results.append(result)
+        print(f"{name:28s} time={result['wall_time'] * 1000:8.2f}ms expanded={result['expanded']:7d} "
+              f"frontier={result['peak_frontier']:7d} mem={result['peak_memory'] / 1024:9.1f}KiB cost={result['cost']}")
+    for path in _generated_maps.values():
+        os.remove(path)
+        if os.path.exists(compiled_path(path)):
+            os.remove(compiled_path(path))
+
+    if args.update_baseline:
+        with open(args.baseline, 'w') as f:
+            json.dump({r['scenario']: r for r in results}, f, indent=2)
+        print(f"Baseline written to {args.baseline}")
+        return 0
+
+    if not os.path.exists(args.baseline):
+        print(f"No baseline at {args.baseline}; run with --update-baseline first.")
+        return 0
+
+    with open(args.baseline) as f:
+        baseline = json.load(f)
+    regressions, slower = compare(results, baseline, args.threshold)
+    if args.gate_timing:
+        regressions += slower
+        slower = []
+    for line in slower:
+        print(f"[SLOWER] {line}")
+    for line in regressions:
+        print(f"[REGRESSION] {line}")
+    if not regressions:
+        print("No regressions against baseline.")
+    return 1 if regressions else 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
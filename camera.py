@@ -0,0 +1,39 @@
+import pygame
+
+
+class Camera:
+    """Khung nhìn kích thước cố định (pixel) trên map, đi theo Pacman.
+
+    rect là vùng map đang thấy, theo toạ độ pixel của map; góc trên-trái của rect nằm ở
+    (0, 0) của màn hình. Theo chiều nào map nhỏ hơn khung nhìn thì map được đặt giữa
+    (rect lệch ra ngoài map), chiều còn lại camera bám theo tâm Pacman và kẹp trong map.
+    """
+
+    def __init__(self, width, height):
+        self.rect = pygame.Rect(0, 0, width, height)
+
+    @property
+    def size(self):
+        return self.rect.size
+
+    def follow(self, center, world_width, world_height):
+        """Đặt camera theo center (pixel trên map); True nếu camera vừa dịch chuyển."""
+        old = self.rect.topleft
+        self.rect.x = self._axis(center[0], self.rect.width, world_width)
+        self.rect.y = self._axis(center[1], self.rect.height, world_height)
+        return self.rect.topleft != old
+
+    @staticmethod
+    def _axis(center, view, world):
+        if world <= view:
+            return (world - view) // 2
+        return max(0, min(int(center) - view // 2, world - view))
+
+    def to_screen(self, rect):
+        return pygame.Rect(rect).move(-self.rect.x, -self.rect.y)
+
+    def to_world(self, rect):
+        return pygame.Rect(rect).move(self.rect.x, self.rect.y)
+
+    def visible(self, rect):
+        return self.rect.colliderect(rect)
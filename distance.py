@@ -0,0 +1,171 @@
+from array import array
+
+_WALKABLE = bytes(0 if c == ord('%') else 1 for c in range(256))
+
+class DistanceOracle:
+    """Bảng khoảng cách BFS từ mọi ô của maze tới một số ô nguồn (food, exit, góc teleport).
+
+    Mỗi nguồn giữ một hàng array số nguyên dài width * height, nên tra khoảng cách
+    từ bất kỳ ô nào tới một nguồn chỉ là một lần đọc mảng. Đồ thị giống
+    get_successors: 4 hướng, wrap-around theo chiều ngang và teleport khi bước vào một góc.
+    Teleport làm khoảng cách có hướng, nên hàng của nguồn b được loang ngược chiều cạnh:
+    row[b][a] là khoảng cách đi từ a tới b. Tới b là đứng ở b, hoặc bước vào b khi b là
+    góc (lúc đó food ở b bị ăn dù Pacman bị teleport đi).
+    """
+
+    def __init__(self, cells, width, height, sources=(), corners=(), rows=None):
+        self.width = width
+        self.height = height
+        self.size = width * height
+        # 'H' (2 byte) đủ cho map nhỏ, map lớn mới cần 'I'
+        self.typecode = 'H' if self.size < 0xFFFF else 'I'
+        self.unreachable = 0xFFFF if self.typecode == 'H' else 0xFFFFFFFF
+
+        # cells: bytearray của Maze (mã ô theo ký tự map), 1 = đi được
+        self._walkable = bytes(cells[:self.size]).translate(_WALKABLE)
+
+        self._teleport = {}
+        corner_ids = [self._index(c) for c in corners]
+        corner_ids = [i for i in corner_ids if i is not None and self._walkable[i]]
+        for i in corner_ids:
+            self._teleport[i] = [j for j in corner_ids if j != i]
+
+        # rows: các hàng đã tính sẵn (vd. memoryview vào file .pmc của mapcache.py)
+        self._rows = dict(rows) if rows else {}
+        # hits: tra được bảng có sẵn; misses: phải BFS thêm một nguồn mới
+        self.hits = 0
+        self.misses = 0
+        for pos in sources:
+            self.add_source(pos)
+
+    def _index(self, pos):
+        x, y = pos
+        if 0 <= x < self.width and 0 <= y < self.height:
+            return y * self.width + x
+        return None
+
+    def add_source(self, pos):
+        pos = (int(pos[0]), int(pos[1]))
+        if pos not in self._rows:
+            self._rows[pos] = self._bfs(self._index(pos))
+        return self._rows[pos]
+
+    def _bfs(self, start):
+        dist = array(self.typecode, [self.unreachable]) * self.size
+        if start is None or not self._walkable[start]:
+            return dist
+
+        width = self.width
+        size = self.size
+        walkable = self._walkable
+        teleport = self._teleport
+        unreachable = self.unreachable
+
+        dist[start] = 0
+        frontier = [start]
+        d = 0
+        # Loang ngược theo từng lớp: cả frontier cùng khoảng cách d tới start
+        while frontier:
+            d += 1
+            next_frontier = []
+            for i in frontier:
+                # Ô trước i là hàng xóm của i; với góc i là hàng xóm của các góc khác
+                # (bước vào góc j thì đứng ở góc i), còn hàng xóm của chính i chỉ khi
+                # i là start (bước vào start là tới)
+                via = teleport.get(i)
+                if via is None:
+                    via = (i,)
+                elif i == start:
+                    via = [i] + via
+                for v in via:
+                    x = v % width
+                    left = v - 1 if x > 0 else v + width - 1
+                    right = v + 1 if x < width - 1 else v - width + 1
+                    for j in (left, right, v - width, v + width):
+                        if 0 <= j < size and walkable[j] and dist[j] == unreachable:
+                            dist[j] = d
+                            next_frontier.append(j)
+            frontier = next_frontier
+        return dist
+
+    def distance(self, a, b):
+        """Khoảng cách ngắn nhất đi từ a tới b, None nếu không tới được."""
+        if a == b:
+            return 0
+        row = self._rows.get(b)
+        if row is None:
+            # Không phải nguồn có sẵn: BFS một lần rồi giữ lại hàng này
+            self.misses += 1
+            row = self.add_source(b)
+        else:
+            self.hits += 1
+
+        i = self._index(a)
+        if i is None or row[i] == self.unreachable:
+            return None
+        return row[i]
+
+    def distances_from(self, source):
+        """Hàm (x, y) -> khoảng cách tới source, None nếu ngoài map / không tới được."""
+        row = self.add_source(source)
+        width, height, unreachable = self.width, self.height, self.unreachable
+
+        def lookup(x, y):
+            if 0 <= x < width and 0 <= y < height:
+                d = row[y * width + x]
+                if d != unreachable:
+                    return d
+            return None
+        return lookup
+
+
+class OracleView(DistanceOracle):
+    """DistanceOracle của một hướng xoay khác có cùng đồ thị, dùng chung các hàng của oracle gốc.
+
+    Hai hướng xoay có cùng tường, cùng góc teleport và cùng cặp ô wrap-around (xem
+    Maze.oracle_owner) thì chỉ cần một bộ bảng khoảng cách. View giữ các hàng đó theo
+    toạ độ của hướng mình; ô (x, y) đổi thẳng sang chỉ số trong hàng của oracle gốc
+    (phép xoay là affine theo x, y) nên tra khoảng cách tốn như DistanceOracle.
+    """
+
+    def __init__(self, oracle, to_owner, from_owner, width, height):
+        # Không gọi DistanceOracle.__init__: grid và các hàng là của oracle gốc
+        self.oracle = oracle
+        self.width = width
+        self.height = height
+        self.size = oracle.size
+        self.typecode = oracle.typecode
+        self.unreachable = oracle.unreachable
+        self._to_owner = to_owner
+        index = [oracle._index(to_owner(x, y)) for x, y in ((0, 0), (1, 0), (0, 1))]
+        self._i0 = index[0]
+        self._ix = index[1] - index[0]
+        self._iy = index[2] - index[0]
+        self._rows = {from_owner(*pos): row for pos, row in oracle._rows.items()}
+        self.hits = 0
+        self.misses = 0
+
+    def _index(self, pos):
+        x, y = pos
+        if 0 <= x < self.width and 0 <= y < self.height:
+            return self._i0 + self._ix * x + self._iy * y
+        return None
+
+    def add_source(self, pos):
+        pos = (int(pos[0]), int(pos[1]))
+        row = self._rows.get(pos)
+        if row is None:
+            row = self.oracle.add_source(self._to_owner(*pos))
+            self._rows[pos] = row
+        return row
+
+    def distances_from(self, source):
+        row = self.add_source(source)
+        unreachable, index = self.unreachable, self._index
+
+        def lookup(x, y):
+            i = index((x, y))
+            if i is not None and row[i] != unreachable:
+                return row[i]
+            return None
+        return lookup
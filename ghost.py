@@ -1,40 +1,235 @@
 import pygame
+from array import array
 from settings import *
+from maze import WALL
+from sprites import SPRITES
+
 
 class Ghost:
-    def __init__(self, game, pos, color):
+    """Một con ma trong GhostSwarm: chỉ là chỉ số vào các mảng của đàn (chỉ đọc)."""
+
+    __slots__ = ('swarm', 'index')
+
+    def __init__(self, swarm, index):
+        self.swarm = swarm
+        self.index = index
+
+    @property
+    def grid_pos(self):
+        return pygame.Vector2(self.swarm.grid_x[self.index], self.swarm.grid_y[self.index])
+
+    @property
+    def pix_pos(self):
+        return pygame.Vector2(self.swarm.pixel_pos(self.index))
+
+    @property
+    def direction(self):
+        return pygame.Vector2(self.swarm.direction(self.index))
+
+    @property
+    def color(self):
+        return self.swarm.colors[self.index]
+
+
+class GhostSwarm:
+    """Mọi con ma của một ván trong các mảng song song, cập nhật cả đàn bằng một lời gọi update().
+
+    Ma đi thẳng 1 px mỗi frame, gặp tường thì quay đầu, và chỉ đổi ô khi khớp lưới. Giữa hai
+    lần khớp lưới, vị trí pixel suy ra được từ số frame: px = px0 + dx * (frame - t0), nên
+    update() chỉ xử lý các con tới hạn ở frame này (vừa khớp lưới hoặc vừa quay đầu, tức là
+    phải kiểm tra tường); các con khác không tốn gì. Ma bị kẹt giữa hai bức tường theo hướng
+    đi chỉ rung qua lại 1 px mãi mãi: được "đỗ" lại, vị trí / hướng suy ra theo chẵn lẻ của frame.
+    Kết quả giống hệt cập nhật từng con mỗi frame.
+
+    occupancy[y * width + x] đếm số ma trên từng ô: va chạm và "có ma ở gần" là tra mảng,
+    không phải duyệt cả đàn.
+    """
+
+    def __init__(self, game, positions, colors=None):
         self.game = game
-        self.grid_pos = pygame.Vector2(pos)
-        self.pix_pos = pygame.Vector2(self.grid_pos.x * TILE_SIZE, self.grid_pos.y * TILE_SIZE)
-        self.direction = pygame.Vector2(1, 0) 
-        self.speed = 1
-        self.color = color
-        
+        n = len(positions)
+        self.colors = list(colors) if colors else [(255, 0, 0)] * n
+        self.grid_x = array('i', [int(x) for x, _ in positions])
+        self.grid_y = array('i', [int(y) for _, y in positions])
+        self.dir_x = array('i', [1]) * n
+        self.dir_y = array('i', [0]) * n
+        # Vị trí pixel ở cuối frame t0
+        self._px0 = array('i', [x * TILE_SIZE for x in self.grid_x])
+        self._py0 = array('i', [y * TILE_SIZE for y in self.grid_y])
+        self._t0 = array('l', [0]) * n
+        # 1 = ô hoặc hướng vừa đổi, frame sau phải kiểm tra tường phía trước
+        self._check = bytearray([1]) * n
+        # 1 = kẹt hai đầu, không còn được xếp lịch cho tới lần xoay maze sau
+        self._parked = bytearray(n)
+        self.frame = 0
+        # frame -> các con ma tới hạn ở frame đó
+        self._due = {1: list(range(n))} if n else {}
+        self._rebuild_occupancy()
+
+    def __len__(self):
+        return len(self.grid_x)
+
+    def __getitem__(self, index):
+        if not -len(self) <= index < len(self):
+            raise IndexError("ghost index out of range")
+        return Ghost(self, index % len(self))
+
+    def __iter__(self):
+        for i in range(len(self)):
+            yield Ghost(self, i)
+
+    def _rebuild_occupancy(self):
+        maze = self.game.maze
+        self._width = maze.tile_width
+        self._height = maze.tile_height
+        self.occupancy = array('H', [0]) * (self._width * self._height)
+        for x, y in zip(self.grid_x, self.grid_y):
+            if 0 <= x < self._width and 0 <= y < self._height:
+                self.occupancy[y * self._width + x] += 1
 
     def update(self):
-        next_grid_pos = self.grid_pos + self.direction
-        current_maze_width = self.game.maze.tile_width
-        current_maze_height = self.game.maze.tile_height
-
-        if not (0 <= next_grid_pos.x < current_maze_width and \
-                0 <= next_grid_pos.y < current_maze_height and \
-                self.game.maze.map_data[int(next_grid_pos.y)][int(next_grid_pos.x)] != '%'):
-            self.direction *= -1
-
-        self.pix_pos += self.direction * self.speed
-        if self.time_to_move():
-            self.pix_pos.x = round(self.pix_pos.x / TILE_SIZE) * TILE_SIZE
-            self.pix_pos.y = round(self.pix_pos.y / TILE_SIZE) * TILE_SIZE
-            self.grid_pos[0] = self.pix_pos[0] // TILE_SIZE
-            self.grid_pos[1] = self.pix_pos[1] // TILE_SIZE
-
-    def draw(self):
-        pygame.draw.circle(self.game.screen, self.color, 
-                           (int(self.pix_pos.x) + TILE_SIZE // 2, int(self.pix_pos.y) + TILE_SIZE // 2), 
-                           TILE_SIZE // 2 - 2)
-    
-    def time_to_move(self):
-        margin = self.speed / 2
-        if self.pix_pos.x % TILE_SIZE < margin and self.pix_pos.y % TILE_SIZE < margin:
-            return True
+        self.frame += 1
+        u = self.frame
+        due = self._due.pop(u, None)
+        if not due:
+            return
+
+        maze = self.game.maze
+        cells, w, h = maze.cells, maze.tile_width, maze.tile_height
+        occupancy = self.occupancy
+        grid_x, grid_y, dir_x, dir_y = self.grid_x, self.grid_y, self.dir_x, self.dir_y
+        px0, py0, t0, check, parked = self._px0, self._py0, self._t0, self._check, self._parked
+        schedule = self._due
+        tile = TILE_SIZE
+
+        for i in due:
+            dx, dy = dir_x[i], dir_y[i]
+            elapsed = u - 1 - t0[i]
+            px = px0[i] + dx * elapsed
+            py = py0[i] + dy * elapsed
+
+            turned = False
+            if check[i]:
+                nx, ny = grid_x[i] + dx, grid_y[i] + dy
+                if not (0 <= nx < w and 0 <= ny < h) or cells[ny * w + nx] == WALL:
+                    dx, dy = -dx, -dy
+                    dir_x[i], dir_y[i] = dx, dy
+                    turned = True
+                    bx, by = grid_x[i] + dx, grid_y[i] + dy
+                    if (px % tile == 0 and py % tile == 0 and
+                            (not (0 <= bx < w and 0 <= by < h) or cells[by * w + bx] == WALL)):
+                        # Phía sau cũng là tường: từ giờ chỉ rung giữa ô và ô lệch 1 px
+                        px0[i], py0[i], t0[i] = px + dx, py + dy, u
+                        parked[i] = 1
+                        continue
+
+            px += dx
+            py += dy
+            px0[i], py0[i], t0[i] = px, py, u
+
+            if px % tile == 0 and py % tile == 0:
+                gx, gy = px // tile, py // tile
+                ox, oy = grid_x[i], grid_y[i]
+                if gx != ox or gy != oy:
+                    if 0 <= ox < w and 0 <= oy < h:
+                        occupancy[oy * w + ox] -= 1
+                    if 0 <= gx < w and 0 <= gy < h:
+                        occupancy[gy * w + gx] += 1
+                    grid_x[i], grid_y[i] = gx, gy
+                check[i] = 1
+                due_at = u + 1
+            elif turned:
+                check[i] = 1
+                due_at = u + 1
+            elif dx or dy:
+                # Đi thẳng không vướng gì tới lần khớp lưới kế tiếp
+                check[i] = 0
+                if dx:
+                    due_at = u + ((-px) % tile if dx > 0 else px % tile)
+                else:
+                    due_at = u + ((-py) % tile if dy > 0 else py % tile)
+            else:
+                continue
+            bucket = schedule.get(due_at)
+            if bucket is None:
+                schedule[due_at] = [i]
+            else:
+                bucket.append(i)
+
+    def rotate(self, old_height):
+        """Maze vừa xoay 90° sang phải: xoay ô và hướng của cả đàn, vị trí pixel về đúng ô.
+
+        Hướng được xoay là hướng ma đang đi ở frame này (ma đỗ: theo chẵn lẻ), đọc trước khi
+        đặt lại t0; frame sau ma đỗ kiểm tra tường và rung tiếp như khi cập nhật từng con.
+        """
+        maze = self.game.maze
+        w, h = maze.tile_width, maze.tile_height
+        for i in range(len(self)):
+            dx, dy = self.direction(i)
+            x, y = self.grid_x[i], self.grid_y[i]
+            new_x = max(0, min(old_height - 1 - y, w - 1))
+            new_y = max(0, min(x, h - 1))
+            self.grid_x[i], self.grid_y[i] = new_x, new_y
+            self._px0[i], self._py0[i] = new_x * TILE_SIZE, new_y * TILE_SIZE
+            self._t0[i] = self.frame
+            self.dir_x[i], self.dir_y[i] = -dy, dx
+            self._check[i] = 1
+            self._parked[i] = 0
+        self._due = {self.frame + 1: list(range(len(self)))} if len(self) else {}
+        self._rebuild_occupancy()
+
+    def pixel_pos(self, i):
+        elapsed = self.frame - self._t0[i]
+        if self._parked[i]:
+            # Frame chẵn (tính từ lúc đỗ): lệch 1 px theo dir; frame lẻ: đúng ô
+            if elapsed % 2:
+                return (self._px0[i] - self.dir_x[i], self._py0[i] - self.dir_y[i])
+            return (self._px0[i], self._py0[i])
+        return (self._px0[i] + self.dir_x[i] * elapsed, self._py0[i] + self.dir_y[i] * elapsed)
+
+    def direction(self, i):
+        if self._parked[i] and (self.frame - self._t0[i]) % 2:
+            return (-self.dir_x[i], -self.dir_y[i])
+        return (self.dir_x[i], self.dir_y[i])
+
+    def cells(self):
+        return list(zip(self.grid_x, self.grid_y))
+
+    def count_at(self, x, y):
+        x, y = int(x), int(y)
+        if 0 <= x < self._width and 0 <= y < self._height:
+            return self.occupancy[y * self._width + x]
+        return 0
+
+    def occupied(self, x, y):
+        return self.count_at(x, y) > 0
+
+    def near(self, x, y, radius):
+        """Có con ma nào cách (x, y) không quá radius ô (Manhattan)."""
+        x, y = int(x), int(y)
+        width, occupancy = self._width, self.occupancy
+        for ny in range(max(0, y - radius), min(self._height, y + radius + 1)):
+            span = radius - abs(ny - y)
+            row = ny * width
+            for nx in range(max(0, x - span), min(width, x + span + 1)):
+                if occupancy[row + nx]:
+                    return True
         return False
+
+    def visible(self, view=None):
+        """[(chỉ số, x, y)] các con ma có ô vẽ giao với view (pixel trên map), None = tất cả."""
+        result = []
+        for i in range(len(self)):
+            px, py = self.pixel_pos(i)
+            if view is None or (view.left - TILE_SIZE < px < view.right and
+                                view.top - TILE_SIZE < py < view.bottom):
+                result.append((i, px, py))
+        return result
+
+    def draw(self, view=None):
+        """Vẽ các con ma trong view; view.topleft là góc màn hình."""
+        screen = self.game.screen
+        ox, oy = (view.x, view.y) if view is not None else (0, 0)
+        colors = self.colors
+        screen.blits([(SPRITES.actor(colors[i]), (int(px) - ox, int(py) - oy))
+                      for i, px, py in self.visible(view)], doreturn=False)
@@ -0,0 +1,168 @@
+import argparse
+import json
+import os
+import random
+import sys
+import time
+
+# Giữ stdout sạch cho JSON
+os.environ.setdefault('PYGAME_HIDE_SUPPORT_PROMPT', '1')
+
+from maze import FOOD
+from main import Game, DEFAULT_MAP, apply_action
+from profiler import FrameProfiler
+from recording import GameRecorder, new_seed
+
+class HeadlessGame(Game):
+    """Chạy auto mode không cần màn hình: không render, không giới hạn FPS."""
+
+    def __init__(self, map_path=DEFAULT_MAP, seed=None, profile_path=None,
+                 plan_time_budget=None, plan_node_budget=None, record_path=None):
+        # Không gọi Game.__init__: không mở cửa sổ, không tạo font/clock
+        self.map_path = map_path
+        self.seed = seed
+        self.screen = None
+        self.game_state = 'playing_auto'
+        self.maze = None
+        self.pacman = None
+        self.problem = None
+        self.ghosts = []
+        self.step_counter = 0
+        self.score = 0
+        self.real_path = []
+        self.profiler = FrameProfiler(export_path=profile_path)
+        # Chạy đồng bộ để kết quả lặp lại được theo seed
+        self.threaded_planning = False
+        self.background_planner = None
+        self.plan_time_budget = plan_time_budget
+        self.plan_node_budget = plan_node_budget
+        self.record_path = record_path
+
+    def draw(self, status_text=""):
+        pass
+
+    def on_maze_rotated(self):
+        pass
+
+    def check_victory_condition(self):
+        return self.reached_exit()
+
+    def run(self, max_steps=10000):
+        if self.record_path and self.seed is None:
+            # Ván được ghi phải chạy lại được: luôn có seed
+            self.seed = new_seed()
+        if self.seed is not None:
+            random.seed(self.seed)
+        self.reset_pacman()
+        self.real_path = []
+        self.game_state = 'playing_auto'
+        recorder = GameRecorder(self.record_path, self, self.seed) if self.record_path else None
+
+        frames = 0
+        plans = 0
+        total_cost = 0
+        planning_time = 0.0
+        max_plan_time = 0.0
+        worst_bound = None
+        outcome = 'timeout'
+        started = time.perf_counter()
+
+        while frames < max_steps:
+            self.profiler.begin_frame()
+            action = None
+            if self.pacman.can_change_direction() or self.ghost_near():
+                cur_pos = (int(self.pacman.grid_pos.x), int(self.pacman.grid_pos.y))
+                state = self.auto_state(cur_pos)
+                if state is None:
+                    outcome = 'no_exit'
+                    break
+
+                t0 = time.perf_counter()
+                action, cost, planned = self.plan_auto_step(state)
+                elapsed = time.perf_counter() - t0
+                planning_time += elapsed
+                max_plan_time = max(max_plan_time, elapsed)
+                if planned:
+                    plans += 1
+                    bound = self.planner.last_bound
+                    if bound is not None and (worst_bound is None or bound > worst_bound):
+                        worst_bound = bound
+
+                if action is None:
+                    outcome = 'no_path'
+                    break
+
+                total_cost += cost
+                apply_action(self.pacman, action)
+
+            with self.profiler.stage('update'):
+                self.pacman.update()
+                self.ghosts.update()
+            self.profiler.end_frame(mode='headless')
+            if recorder:
+                recorder.record_frame(self, action)
+            frames += 1
+
+            if self.check_victory_condition():
+                outcome = 'win'
+                break
+
+            if self.pacman_caught():
+                outcome = 'game_over'
+                break
+
+        self.game_state = outcome
+        if recorder:
+            recorder.close()
+        result = {
+            'map': self.map_path,
+            'seed': self.seed,
+            'outcome': outcome,
+            'won': outcome == 'win',
+            'frames': frames,
+            'steps': self.pacman.step_count,
+            'plans': plans,
+            'follows': self.follower.follows,
+            'replan_triggers': dict(self.follower.triggers),
+            'total_cost': total_cost,
+            'food_left': self.maze.cells.count(FOOD),
+            'planning_time': round(planning_time, 6),
+            'max_plan_time': round(max_plan_time, 6),
+            'worst_bound': worst_bound,
+            'wall_time': round(time.perf_counter() - started, 6),
+            'path': list(self.real_path),
+        }
+        self.profiler.write(dict(result, type='run'))
+        self.profiler.close()
+        return result
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Chạy Pacman auto mode không cần màn hình.")
+    parser.add_argument('--map', default=DEFAULT_MAP, help="đường dẫn file map (.txt)")
+    parser.add_argument('--seed', type=int, default=None, help="seed cho random (teleport)")
+    parser.add_argument('--max-steps', type=int, default=10000, help="số frame tối đa")
+    parser.add_argument('--output', default=None, help="ghi kết quả JSON ra file thay vì stdout")
+    parser.add_argument('--profile-out', default=None, help="ghi số đo từng frame ra file JSONL")
+    parser.add_argument('--plan-budget-ms', type=float, default=None, help="giới hạn thời gian mỗi lần lập kế hoạch (ARA*)")
+    parser.add_argument('--node-budget', type=int, default=None, help="giới hạn số node mở rộng mỗi lần lập kế hoạch (ARA*)")
+    parser.add_argument('--record', default=None, help="ghi ván ra file nhị phân để xem lại (recording.py)")
+    args = parser.parse_args(argv)
+
+    time_budget = args.plan_budget_ms / 1000 if args.plan_budget_ms is not None else None
+    game = HeadlessGame(args.map, seed=args.seed, profile_path=args.profile_out,
+                        plan_time_budget=time_budget, plan_node_budget=args.node_budget,
+                        record_path=args.record)
+    result = game.run(max_steps=args.max_steps)
+
+    if args.output:
+        with open(args.output, 'w') as f:
+            json.dump(result, f, indent=2)
+    else:
+        json.dump(result, sys.stdout, indent=2)
+        print()
+    return 0 if result['won'] else 1
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -1,21 +1,77 @@
 import pygame
 import sys
 from settings import *
-from maze import Maze
+from maze import Maze, FOOD, EXIT
 from pacman import Pacman
-from ghost import Ghost
-from search import PacmanSearchProblem, a_star_search
+from ghost import GhostSwarm
+from search import PacmanSearchProblem
+from planner import BackgroundPlanner, PlanFollower
+from route import make_planner
+from profiler import FrameProfiler
+from camera import Camera
+from sprites import TextCache
+from recording import GameRecorder, new_seed
+import argparse
 import random
 
+DEFAULT_MAP = 'maps/task02_pacman_example_map.txt'
+
+ACTION_VECTORS = {
+    'North': (0, -1),
+    'South': (0, 1),
+    'East': (1, 0),
+    'West': (-1, 0),
+}
+
+# Trigger mà kế hoạch cũ vẫn đi được trong lúc chờ thread planner (state còn trên kế hoạch, layout chưa đổi)
+
+def action_to_vector(action):
+    # Teleport / Stop -> đứng yên, A* sẽ lập lại kế hoạch ở bước sau
+    return pygame.Vector2(ACTION_VECTORS.get(action, (0, 0)))
+
+def apply_action(pacman, action):
+    """Đưa action của planner cho Pacman; 'Stop' (vd. đang chờ kế hoạch) thì đứng lại thật."""
+    dir_vec = action_to_vector(action)
+    if dir_vec.length() > 0:
+        pacman.move(dir_vec)
+    elif action == 'Stop':
+        pacman.stop()
+
 class Game:
-    def __init__(self):
+    def __init__(self, map_path=DEFAULT_MAP, profile_path=None, threaded_planning=True,
+                 plan_time_budget=None, plan_node_budget=None, record_path=None, turbo=None):
         pygame.init()
         self.screen = pygame.display.set_mode((SCREEN_WIDTH, SCREEN_HEIGHT))
         pygame.display.set_caption("Pacman AI Project")
         self.clock = pygame.time.Clock()
         self.font_big = pygame.font.SysFont("comicsansms", 50)
         self.font_small = pygame.font.SysFont("comicsansms", 24)
+        self.font_profiler = pygame.font.SysFont("monospace", 14)
+        # Chữ vẽ lại mỗi frame (HUD, bảng profiler, GAME OVER / YOU WIN) lấy từ cache theo (chuỗi, màu)
+        self.text_big = TextCache(self.font_big)
+        self.text_small = TextCache(self.font_small)
+        self.text_profiler = TextCache(self.font_profiler)
+        # F3 bật/tắt bảng đo thời gian; profile_path: ghi từng frame ra JSONL
+        self.profiler = FrameProfiler(export_path=profile_path)
+        self.show_profiler = False
+        # Auto mode: A* chạy ở thread riêng, game không chờ mà bám theo kế hoạch mới nhất;
+        # threaded_planning=False: lập kế hoạch ngay trong vòng lặp (kết quả lặp lại được)
+        self.threaded_planning = threaded_planning
+        self.background_planner = None
+        self._seen_plan_seq = None
+        self._plan_request = None
+        # Ngân sách mỗi lần lập kế hoạch (giây / số node); có thì dùng ARA* thay A*
+        self.plan_time_budget = plan_time_budget
+        self.plan_node_budget = plan_node_budget
+        # Ghi mỗi ván auto ra file (ván sau ghi đè ván trước)
+        self.record_path = record_path
+        # Turbo: None = bình thường, N = vẽ 1 frame mỗi N bước, 'events' = chỉ vẽ khi có sự kiện
+        self.turbo = turbo
+        self._turbo_steps = 0
+        self._turbo_event_key = None
+        self._last_render_ticks = 0
         
+        self.map_path = map_path
         self.game_state = 'menu'
         self.maze = None
         self.pacman = None
@@ -23,20 +79,16 @@ class Game:
         self.ghosts = []
         self.step_counter = 0
         self.score = 0
+        self._full_redraw = True
+        self._drawn_layout = None
+        self.camera = Camera(SCREEN_WIDTH, SCREEN_HEIGHT)
+        self._last_actor_rects = []
+        self._last_overlay_rect = None
         
         try:
             self.load_initial_data()
-        except Exception as e:
-            print(f"ERR: {e}")
-            pygame.quit(); sys.exit()
-        
-        try:
-            temp_maze = Maze('maps/task02_pacman_example_map.txt') 
-            
-            self.screen = pygame.display.set_mode((temp_maze.width, temp_maze.height))
-            
-            self.load_initial_data() 
-            
+            self.screen = pygame.display.set_mode(self.viewport_size())
+            self.camera = Camera(*self.screen.get_size())
         except Exception as e:
             print(f"ERR: {e}")
             pygame.quit(); sys.exit()
@@ -44,15 +96,26 @@ class Game:
         pygame.display.set_caption("Pacman AI Project")
 
     def load_initial_data(self):
-        self.maze = Maze('maps/task02_pacman_example_map.txt')
+        self.maze = Maze(self.map_path)
         self.maze.game = self 
         self.problem = PacmanSearchProblem(self.maze)
-        self.ghosts = []
+        budgets = (self.plan_time_budget, self.plan_node_budget)
+        self.planner = make_planner(self.problem, *budgets)
+        if self.background_planner is not None:
+            self.background_planner.stop()
+        self.background_planner = None
+        if self.threaded_planning:
+            self.background_planner = BackgroundPlanner(self.problem, planner=make_planner(self.problem, *budgets))
+        self._seen_plan_seq = None
+        self._plan_request = None
+        self.follower = PlanFollower()
+        # Bitmask food hiện tại, chỉ quét lại map khi (số food đã ăn, layout) đổi
+        self._food_key = None
+        self._food_mask = None
         ghost_positions = self.problem._find_all_chars_in_maze('G')
         ghost_colors = [(255,184,222), (255,0,0), (0,255,255), (255,184,82)]
-        for i, pos in enumerate(ghost_positions):
-            color = ghost_colors[i % len(ghost_colors)]
-            self.ghosts.append(Ghost(self, pos, color))
+        colors = [ghost_colors[i % len(ghost_colors)] for i in range(len(ghost_positions))]
+        self.ghosts = GhostSwarm(self, ghost_positions, colors)
 
     def reset_pacman(self):
         self.step_counter = 0
@@ -60,6 +123,7 @@ class Game:
         start_pos = self.problem.get_start_state()[0]
         if not start_pos: raise ValueError("ERR: Not found Pacman 'P'.")
         self.pacman = Pacman(self, start_pos)
+        self.request_full_redraw()
 
     def run(self):
         while True:
@@ -95,28 +159,30 @@ class Game:
 
     def run_manual_mode(self):
         while self.game_state == 'playing_manual':
+            self.profiler.begin_frame()
             for event in pygame.event.get():
                 if event.type == pygame.QUIT: pygame.quit(); sys.exit()
                 if event.type == pygame.KEYDOWN:
                     if event.key == pygame.K_ESCAPE: self.game_state = 'menu'
+                    if event.key == pygame.K_F3: self.toggle_profiler()
                     if event.key == pygame.K_LEFT: self.pacman.move(pygame.Vector2(-1, 0))
                     if event.key == pygame.K_RIGHT: self.pacman.move(pygame.Vector2(1, 0))
                     if event.key == pygame.K_UP: self.pacman.move(pygame.Vector2(0, -1))
                     if event.key == pygame.K_DOWN: self.pacman.move(pygame.Vector2(0, 1))
 
-            self.pacman.update()
-            for ghost in self.ghosts: ghost.update()
+            with self.profiler.stage('update'):
+                self.pacman.update()
+                self.ghosts.update()
             
             if self.check_victory_condition():
                 return
 
-            if self.pacman.power_up_timer == 0:
-                for ghost in self.ghosts:
-                    if ghost.grid_pos == self.pacman.grid_pos:
-                        self.game_state = 'game_over'
-                        break
+            if self.pacman.power_up_timer == 0 and self.ghosts.occupied(*self.pacman.grid_pos):
+                self.game_state = 'game_over'
             
-            self.draw("Mode: Manual | Press ESC for Menu")
+            with self.profiler.stage('draw'):
+                self.draw("Mode: Manual | Press ESC for Menu")
+            self.profiler.end_frame(mode='manual')
             self.clock.tick(60)
             
     def run_auto_mode(self):
@@ -129,95 +195,87 @@ class Game:
         direction_stats = {'North': 0, 'South': 0, 'East': 0, 'West': 0, 'Stop': 0}
         total_steps = 0
         total_cost = 0
+        won = False
+        recorder = None
+        if self.record_path:
+            seed = new_seed()
+            random.seed(seed)
+            recorder = GameRecorder(self.record_path, self, seed)
 
         while self.game_state == 'playing_auto' and iters < max_iterations:
+            self.profiler.begin_frame()
             for event in pygame.event.get():
                 if event.type == pygame.QUIT:
                     pygame.quit(); sys.exit()
+                if event.type == pygame.KEYDOWN and event.key == pygame.K_F3:
+                    self.toggle_profiler()
+                if event.type == pygame.KEYDOWN and event.key == pygame.K_t:
+                    self.cycle_turbo()
                 if event.type == pygame.KEYDOWN and event.key == pygame.K_ESCAPE:
                     self.game_state = 'menu'
+                    if recorder: recorder.close()
+                    self.report_auto_run(direction_stats, total_steps, total_cost, 'aborted')
                     return
 
-            ghost_near = any(
-                abs(int(self.pacman.grid_pos.x) - int(g.grid_pos.x)) +
-                abs(int(self.pacman.grid_pos.y) - int(g.grid_pos.y)) <= 3
-                for g in self.ghosts
-            )
-
-            if self.pacman.can_change_direction() or ghost_near:
+            next_action = None
+            if self.pacman.can_change_direction() or self.ghost_near():
                 if self.pacman.just_powered_up:
                     self.pacman.just_powered_up = False
                 cur_pos = (int(self.pacman.grid_pos.x), int(self.pacman.grid_pos.y))
-                food_list = []
-                for y, row in enumerate(self.maze.map_data):
-                    for x, ch in enumerate(row):
-                        if ch == '.':
-                            food_list.append((x, y))
-
-                if len(food_list) == 0:
-                    exit_pos = getattr(self.maze, "exit_pos", None)
-                    if exit_pos is None:
-                        found = None
-                        for y, row in enumerate(self.maze.map_data):
-                            for x, ch in enumerate(row):
-                                if ch in ('E', 'X', '>', 'e', 'x'):
-                                    found = (x, y)
-                                    break
-                            if found: break
-                        exit_pos = found
-
-                    if exit_pos is None:
-                        self.draw("No exit found; ending auto mode."); pygame.time.wait(300)
-                        self.game_state = 'menu'
-                        return
-                    else:
-                        food_list = [exit_pos]
-
-                problem_state = (cur_pos, frozenset(food_list))
-                saved_start = self.problem.start_state
-                self.problem.start_state = problem_state
-
-                solution, cost = a_star_search(self.problem, return_cost=True)
-                self.problem.start_state = saved_start
-
-                if not solution or len(solution) == 0:
+                state = self.auto_state(cur_pos)
+                if state is None:
+                    self.draw("No exit found; ending auto mode."); pygame.time.wait(300)
+                    self.game_state = 'menu'
+                    if recorder: recorder.close()
+                    return
+
+                # Turbo chạy nhanh hơn thread planner: lập kế hoạch ngay trong vòng lặp
+                if self.background_planner is not None and self.turbo is None:
+                    next_action, cost = self.follow_background_plan(state)
+                else:
+                    next_action, cost, _ = self.plan_auto_step(state)
+
+                if next_action is None:
                     self.draw("No path found (replanning...)"); pygame.time.wait(200)
                     self.game_state = 'menu'
+                    if recorder: recorder.close()
+                    self.report_auto_run(direction_stats, total_steps, total_cost, 'no_path')
                     return
 
-                next_action = solution[0]
                 total_cost += cost
                 total_steps += 1
                 if next_action in direction_stats:
                     direction_stats[next_action] += 1
 
-                dir_vec = pygame.Vector2(0, 0)
-                if next_action == 'North': dir_vec = pygame.Vector2(0, -1)
-                elif next_action == 'South': dir_vec = pygame.Vector2(0, 1)
-                elif next_action == 'East': dir_vec = pygame.Vector2(1, 0)
-                elif next_action == 'West': dir_vec = pygame.Vector2(-1, 0)
-                elif next_action == 'Teleport' or next_action == 'Stop':
-                    dir_vec = pygame.Vector2(0, 0)
+                if next_action == 'Teleport' or next_action == 'Stop':
                     direction_stats['Stop'] += 1
 
-                if dir_vec.length() > 0:
-                    self.pacman.move(dir_vec)
+                apply_action(self.pacman, next_action)
 
-            self.pacman.update()
-            for ghost in self.ghosts:
-                ghost.update()
+            with self.profiler.stage('update'):
+                self.pacman.update()
+                self.ghosts.update()
+            if recorder:
+                recorder.record_frame(self, next_action)
 
             if self.check_victory_condition():
+                self.profiler.end_frame(mode='auto')
+                won = True
                 break
 
-            if self.pacman.power_up_timer == 0:
-                for ghost in self.ghosts:
-                    if ghost.grid_pos == self.pacman.grid_pos:
-                        self.game_state = 'game_over'
-                        break
+            if self.pacman_caught():
+                self.game_state = 'game_over'
 
-            self.draw("Mode : Auto")
-            self.clock.tick(60)
+            render = self.turbo_should_render()
+            if render:
+                with self.profiler.stage('draw'):
+                    self.draw(self.auto_status_text())
+            self.profiler.end_frame(mode='auto')
+            if self.turbo is None:
+                self.clock.tick(60)
+            elif render:
+                # Turbo: không giới hạn FPS, tick chỉ để đo
+                self.clock.tick()
             iters += 1
 
         for ghost in self.ghosts:
@@ -230,36 +288,304 @@ class Game:
             print("[WARN] Auto mode reached iteration limit.")
             self.game_state = 'menu'
 
-
+        if recorder:
+            recorder.close()
+        if won:
+            outcome = 'win'
+        elif self.game_state == 'game_over':
+            outcome = 'game_over'
+        else:
+            outcome = 'timeout'
+        self.report_auto_run(direction_stats, total_steps, total_cost, outcome)
+
+    def report_auto_run(self, direction_stats, total_steps, total_cost, outcome):
+        """In tổng kết một ván auto và ghi thêm một bản ghi 'run' vào JSONL (nếu có)."""
+        planners = [self.planner] + ([self.background_planner.planner] if self.background_planner else [])
+        full_replans = sum(p.full_replans for p in planners)
+        repairs = sum(p.repairs for p in planners)
+        reuses = sum(p.reuses for p in planners)
+        triggers = dict(self.follower.triggers)
+        summary = {
+            'type': 'run',
+            'map': self.map_path,
+            'outcome': outcome,
+            'decisions': total_steps,
+            'total_cost': total_cost,
+            'direction_stats': direction_stats,
+            'steps': self.pacman.step_count,
+            'full_replans': full_replans,
+            'repairs': repairs,
+            'reuses': reuses,
+            'follows': self.follower.follows,
+            'replan_triggers': triggers,
+            'frame_averages_ms': {k: round(v, 4) for k, v in self.profiler.averages().items()},
+        }
+        print(f"[AUTO] {outcome}: {total_steps} decisions, cost {total_cost}, moves {direction_stats}, "
+              f"plans full/repair/reuse {full_replans}/{repairs}/{reuses}, "
+              f"followed {self.follower.follows}, triggers {triggers}")
+        self.profiler.write(summary)
+        return summary
+
+
+    def ghost_near(self, radius=AUTO_REPLAN_GHOST_DISTANCE):
+        return self.ghosts.near(self.pacman.grid_pos.x, self.pacman.grid_pos.y, radius)
+
+    def pacman_caught(self):
+        if self.pacman.power_up_timer > 0:
+            return False
+        return self.ghosts.occupied(*self.pacman.grid_pos)
+
+    def find_auto_targets(self):
+        """Food còn lại trên map; khi hết food thì trả về [exit], None nếu không có exit."""
+        food_list = self.maze.find_all(FOOD)
+
+        if len(food_list) == 0:
+            exit_pos = getattr(self.maze, "exit_pos", None)
+            if exit_pos is None:
+                found = None
+                for y, row in enumerate(self.maze.map_data):
+                    for x, ch in enumerate(row):
+                        if ch in ('E', 'X', '>', 'e', 'x'):
+                            found = (x, y)
+                            break
+                    if found: break
+                exit_pos = found
+
+            if exit_pos is None:
+                return None
+            food_list = [exit_pos]
+        return food_list
+
+    def auto_state(self, cur_pos):
+        """State (ô Pacman, bitmask food) hiện tại, None nếu hết food mà không có exit.
+
+        Map chỉ được quét lại khi có food bị ăn hoặc maze xoay.
+        """
+        key = (self.maze.eaten, self.maze.layout_version)
+        if key != self._food_key:
+            targets = self.find_auto_targets()
+            self._food_key = key
+            self._food_mask = None if targets is None else self.problem.food_index.encode(targets)
+        if self._food_mask is None:
+            return None
+        return (cur_pos, self._food_mask)
+
+    def auto_events(self):
+        return (self.maze.layout_version, self.pacman.last_teleport_time, self.pacman.power_up_timer > 0)
+
+    def ghost_cells(self):
+        return self.ghosts.cells()
+
+    def rotation_horizon(self):
+        """Số bước Pacman còn đi trước lần xoay maze kế tiếp."""
+        return MAZE_ROTATION_STEPS - self.pacman.step_count % MAZE_ROTATION_STEPS
+
+    def plan_auto_step(self, state):
+        """(action, cost, planned): đi tiếp theo kế hoạch đang giữ, chỉ gọi planner khi có sự kiện."""
+        ghosts = self.ghost_cells()
+        step = self.follower.follow(state, self.auto_events(), ghosts)
+        if step is not None:
+            return step[0], step[1], False
+
+        path, cost = self.plan_auto_path(state)
+        if not path:
+            self.follower.clear()
+            return None, 0, True
+        self.follower.adopt(path, self.planner.last_states(), self.planner.last_costs(),
+                            self.auto_events(), ghosts, self.rotation_horizon())
+        return path[0], cost, True
+
+    def plan_auto_path(self, state):
+        with self.profiler.stage('plan'):
+            result = self.planner.plan(state)
+        self.profiler.record_search(self.planner.last_kind, self.planner.last_stats, self.planner.last_bound)
+        return result
+
+    def follow_background_plan(self, state):
+        """(action, cost) như plan_auto_step nhưng kế hoạch do thread planner lập.
+
+        Không chờ thread: khi PlanFollower cần lập lại thì gửi yêu cầu (một lần cho mỗi
+        state và bộ sự kiện) rồi vẫn đi theo kế hoạch cũ nếu state còn nằm trên nó, trừ
+        khi maze vừa xoay (toạ độ của kế hoạch cũ không còn đúng) hoặc bước đó đi vào ô sát
+        ma (safe_step). (None, 0) khi planner đã tìm từ đúng state này mà không có đường.
+        """
+        events = self.auto_events()
+        ghosts = self.ghost_cells()
+        result = self.take_background_plan()
+        if result is not None and not result.path and result.start_state == state:
+            return None, 0
+        step = self.follower.follow(state, events, ghosts)
+        if step is not None:
+            return self.safe_step(state, step)
+        trigger = self.follower.last_trigger
+
+        request = self._plan_request
+        if request is None or request[1] != state or request[2] != events:
+            with self.profiler.stage('plan'):
+                seq = self.background_planner.submit(state)
+            self._plan_request = (seq, state, events, ghosts, self.rotation_horizon())
+
+        step = self.follower.step_at(state) if trigger != 'rotation' else None
+        return self.safe_step(state, step)
+
+    def safe_step(self, state, step):
+        """step (action, cost) nếu ô nó đi tới không sát ma; không thì ô quanh Pacman ít phạt
+        DangerField nhất, đứng yên nếu ô hiện tại đã ít phạt nhất. step None: chưa có kế hoạch."""
+        penalty = self.problem.update_danger_field().penalty
+        moves = {action: next_state[0] for next_state, action, _ in self.problem.get_successors(state)}
+        if step is not None and penalty.get(moves.get(step[0]), 0) < 1500:
+            return step
+        best, best_penalty = ('Stop', 0), penalty.get(state[0], 0)
+        for action, pos in moves.items():
+            if penalty.get(pos, 0) < best_penalty:
+                best, best_penalty = (action, 0), penalty.get(pos, 0)
+        return best
+
+    def take_background_plan(self):
+        """Nhận kết quả mới của thread planner; trả về nó nếu là kế hoạch cho yêu cầu gần nhất."""
+        result = self.background_planner.latest()
+        if result is None or result.seq == self._seen_plan_seq:
+            return None
+        self._seen_plan_seq = result.seq
+        self.profiler.record_search(result.kind, result.stats, result.bound)
+        request = self._plan_request
+        if request is None or result.seq != request[0]:
+            return None
+        if result.path:
+            # Sự kiện, vị trí ma và horizon lúc gửi yêu cầu: kế hoạch được lập theo chúng
+            self.follower.adopt(result.path, result.states, result.costs, *request[2:])
+        return result
+
+    def viewport_size(self):
+        """Kích thước cửa sổ: đủ chứa map ở cả hai chiều xoay, tối đa SCREEN_WIDTH x SCREEN_HEIGHT."""
+        side = max(self.maze.width, self.maze.height)
+        return min(side, SCREEN_WIDTH), min(side, SCREEN_HEIGHT)
+
+    def on_maze_rotated(self):
+        # Cửa sổ giữ nguyên kích thước, camera tự căn lại ở lần vẽ sau
+        self.request_full_redraw()
+
+    def request_full_redraw(self):
+        self._full_redraw = True
+
+    def cycle_turbo(self):
+        """Tắt -> xN (theo TURBO_STEPS) -> chỉ vẽ khi có sự kiện -> tắt."""
+        modes = [None] + list(TURBO_STEPS) + ['events']
+        self.turbo = modes[(modes.index(self.turbo) + 1) % len(modes)] if self.turbo in modes else None
+        if self.turbo is not None and self.background_planner is not None:
+            # Turbo lập kế hoạch ngay trên thread game: thread planner không được chạy song song
+            self.background_planner.cancel()
+            self._plan_request = None
+        self._turbo_steps = 0
+        self.request_full_redraw()
+
+    def turbo_should_render(self):
+        if self.turbo is None or self.game_state != 'playing_auto':
+            return True
+        if self.turbo == 'events':
+            # Ăn food, xoay maze, teleport; thêm một lần vẽ định kỳ để màn hình không đứng
+            key = (self.maze.eaten, self.maze.layout_version, self.pacman.last_teleport_time)
+            now = pygame.time.get_ticks()
+            if key == self._turbo_event_key and now - self._last_render_ticks < TURBO_REFRESH_MS:
+                return False
+            self._turbo_event_key = key
+            self._last_render_ticks = now
+            return True
+        self._turbo_steps += 1
+        return self._turbo_steps % self.turbo == 0
+
+    def auto_status_text(self):
+        if self.turbo is None:
+            return "Mode : Auto"
+        if self.turbo == 'events':
+            return "Mode : Auto | TURBO (events)"
+        return f"Mode : Auto | TURBO x{self.turbo}"
+
+    def toggle_profiler(self):
+        self.show_profiler = not self.show_profiler
+        self.request_full_redraw()
+
+    def _draw_profiler_overlay(self):
+        lines = self.profiler.hud_lines()
+        line_height = self.font_profiler.get_linesize()
+        surfaces = [self.text_profiler.render(line, WHITE) for line in lines]
+        width = max(s.get_width() for s in surfaces) + 12
+        height = line_height * len(surfaces) + 8
+        rect = pygame.Rect(0, self.screen.get_height() - height, width, height)
+        panel = pygame.Surface(rect.size)
+        panel.set_alpha(200)
+        panel.fill(STATUS_BAR_BG)
+        self.screen.blit(panel, rect)
+        for i, surface in enumerate(surfaces):
+            self.screen.blit(surface, (rect.x + 6, rect.y + 4 + i * line_height))
+        return rect
+
+    def _actor_rects(self):
+        """Ô vẽ (toạ độ màn hình) của các actor đang nằm trong camera."""
+        view = self.camera.rect
+        positions = [(x, y) for _, x, y in self.ghosts.visible(view)]
+        if self.pacman:
+            positions.append(self.pacman.pix_pos)
+        rects = [pygame.Rect(int(x), int(y), TILE_SIZE, TILE_SIZE) for x, y in positions]
+        return [self.camera.to_screen(rect) for rect in rects if view.colliderect(rect)]
 
     def draw(self, status_text=""):
-        self.screen.fill(BLACK)
-        self.maze.draw(self.screen)
-        
-        if self.pacman: self.pacman.draw()
-        for ghost in self.ghosts: ghost.draw()
-        
         current_width = self.screen.get_width()
+        hud_rect = pygame.Rect(0, 0, current_width, self.font_small.get_height() + 10)
+
+        if self.pacman:
+            center = (self.pacman.pix_pos.x + TILE_SIZE / 2, self.pacman.pix_pos.y + TILE_SIZE / 2)
+        else:
+            center = (self.maze.width / 2, self.maze.height / 2)
+        moved = self.camera.follow(center, self.maze.width, self.maze.height)
+        view = self.camera.rect
+
+        full = self._full_redraw or moved or self._drawn_layout != self.maze.layout_version
+        if full:
+            self.screen.fill(BLACK)
+            self.maze.draw(self.screen, view)
+            self.maze.take_dirty_rects()
+            dirty = None
+        else:
+            # Chỉ khôi phục nền ở chỗ actor vừa đứng, food vừa bị ăn và thanh trạng thái
+            eaten = [self.camera.to_screen(rect) for rect in self.maze.take_dirty_rects()]
+            dirty = self._last_actor_rects + eaten + [hud_rect]
+            if self._last_overlay_rect:
+                dirty.append(self._last_overlay_rect)
+            for rect in dirty:
+                self.screen.fill(BLACK, rect)
+                self.maze.draw(self.screen, view, self.camera.to_world(rect))
+
+        if self.pacman: self.pacman.draw(view.topleft)
+        self.ghosts.draw(view)
+        self._last_actor_rects = self._actor_rects()
         
         y_pos = 5 
         
-        status_surface = self.font_small.render(status_text, True, (180, 180, 180)) 
+        status_surface = self.text_small.render(status_text, (180, 180, 180))
         self.screen.blit(status_surface, (10, y_pos))
 
         score_text = f"SCORE: {self.score}" 
-        score_surface = self.font_small.render(score_text, True, YELLOW)
+        score_surface = self.text_small.render(score_text, YELLOW)
         score_rect = score_surface.get_rect(right=current_width - 10, top=y_pos)
         self.screen.blit(score_surface, score_rect)
         
         if self.pacman and self.pacman.power_up_timer > 0:
             time_left = max(0, int(self.pacman.power_up_timer / 60) + 1)
             timer_text = f"POWER UP"
-            timer_surface = self.font_small.render(timer_text, True, (255, 50, 50)) 
+            timer_surface = self.text_small.render(timer_text, (255, 50, 50))
             
             timer_rect = timer_surface.get_rect(center=(current_width / 2, y_pos + self.font_small.get_height()/2))
             self.screen.blit(timer_surface, timer_rect)
-        
-        pygame.display.flip()
+
+        self._last_overlay_rect = self._draw_profiler_overlay() if self.show_profiler else None
+        if full:
+            pygame.display.flip()
+            self._full_redraw = False
+            self._drawn_layout = self.maze.layout_version
+        else:
+            pygame.display.update(dirty + self._last_actor_rects +
+                                  ([self._last_overlay_rect] if self._last_overlay_rect else []))
 
     def run_game_over(self):
         start_time = pygame.time.get_ticks()
@@ -269,57 +595,72 @@ class Game:
             self.draw("GAME OVER")
             current_width = self.screen.get_width()
             current_height = self.screen.get_height()
-            game_over_text = self.font_big.render("GAME OVER", True, (255, 0, 0))
+            game_over_text = self.text_big.render("GAME OVER", (255, 0, 0))
             rect = game_over_text.get_rect(center=(current_width / 2, current_height / 2))
             self.screen.blit(game_over_text, rect)
             pygame.display.flip()
         self.game_state = 'menu'
         
-    def check_victory_condition(self):
-        remaining_food = any('.' in row for row in self.maze.map_data)
-        gates = self.problem._find_all_chars_in_maze('E')
-        if not gates:
-            return False  
+    def reached_exit(self):
+        remaining_food = FOOD in self.maze.cells
+        gates = self.maze.find_all(EXIT)
+        if not gates or remaining_food:
+            return False
 
         pacman_pos = pygame.Vector2(int(self.pacman.grid_pos.x), int(self.pacman.grid_pos.y))
-        if not remaining_food:
-            for gx, gy in gates:
-                if abs(pacman_pos.x - gx) + abs(pacman_pos.y - gy) <= 1:
-                    start_time = pygame.time.get_ticks()
-                    while pygame.time.get_ticks() - start_time < 3000:
-                        for event in pygame.event.get():
-                            if event.type == pygame.QUIT:
-                                pygame.quit()
-                                sys.exit()
-
-                        self.draw("YOU WIN!")
-
-                        current_width = self.screen.get_width()
-                        current_height = self.screen.get_height()
-
-                        win_text = self.font_big.render("YOU WIN!", True, (0, 255, 0))
-                        win_rect = win_text.get_rect(center=(current_width / 2, current_height / 2 - 20))
-                        self.screen.blit(win_text, win_rect)
-                        total_steps = self.pacman.step_count
-                        
-                        steps_text = self.font_small.render(f"Total Steps: {total_steps}", True, WHITE)
-                        steps_rect = steps_text.get_rect(center=(current_width / 2, current_height / 2 + 30))
-                        
-                        self.screen.blit(steps_text, steps_rect)
-
-                        if not hasattr(self, "win_message_printed"):
-                            self.win_message_printed = True 
-                            if hasattr(self, "real_path") and len(self.real_path) > 0:
-                                print(f"Total Steps: {self.pacman.step_count} | Path: {' -> '.join(self.real_path)}")
-
-
-                        pygame.display.flip()
-                        
-                    self.game_state = 'menu'
-                    return True
+        return any(abs(pacman_pos.x - gx) + abs(pacman_pos.y - gy) <= 1 for gx, gy in gates)
+
+    def check_victory_condition(self):
+        if self.reached_exit():
+            start_time = pygame.time.get_ticks()
+            while pygame.time.get_ticks() - start_time < 3000:
+                for event in pygame.event.get():
+                    if event.type == pygame.QUIT:
+                        pygame.quit()
+                        sys.exit()
+
+                self.draw("YOU WIN!")
+
+                current_width = self.screen.get_width()
+                current_height = self.screen.get_height()
+
+                win_text = self.text_big.render("YOU WIN!", (0, 255, 0))
+                win_rect = win_text.get_rect(center=(current_width / 2, current_height / 2 - 20))
+                self.screen.blit(win_text, win_rect)
+                total_steps = self.pacman.step_count
+                
+                steps_text = self.text_small.render(f"Total Steps: {total_steps}", WHITE)
+                steps_rect = steps_text.get_rect(center=(current_width / 2, current_height / 2 + 30))
+                
+                self.screen.blit(steps_text, steps_rect)
+
+                if not hasattr(self, "win_message_printed"):
+                    self.win_message_printed = True 
+                    if hasattr(self, "real_path") and len(self.real_path) > 0:
+                        print(f"Total Steps: {self.pacman.step_count} | Path: {' -> '.join(self.real_path)}")
+
+
+                pygame.display.flip()
+                
+            self.game_state = 'menu'
+            return True
         return False
 
 
 if __name__ == '__main__':
-    game = Game()
+    parser = argparse.ArgumentParser(description="Pacman AI Project")
+    parser.add_argument('--map', default=DEFAULT_MAP, help="đường dẫn file map (.txt)")
+    parser.add_argument('--profile-out', default=None, help="ghi số đo từng frame ra file JSONL")
+    parser.add_argument('--threaded-planner', action=argparse.BooleanOptionalAction, default=True,
+                        help="chạy A* ở thread riêng (--no-threaded-planner: ngay trong vòng lặp game)")
+    parser.add_argument('--plan-budget-ms', type=float, default=None, help="giới hạn thời gian mỗi lần lập kế hoạch (ARA*)")
+    parser.add_argument('--node-budget', type=int, default=None, help="giới hạn số node mở rộng mỗi lần lập kế hoạch (ARA*)")
+    parser.add_argument('--record', default=None, help="ghi mỗi ván auto ra file nhị phân (recording.py)")
+    parser.add_argument('--turbo', default=None, help="bật turbo từ đầu: số bước mỗi frame vẽ hoặc 'events'")
+    args = parser.parse_args()
+    turbo = args.turbo if args.turbo in (None, 'events') else int(args.turbo)
+    time_budget = args.plan_budget_ms / 1000 if args.plan_budget_ms is not None else None
+    game = Game(args.map, profile_path=args.profile_out, threaded_planning=args.threaded_planner,
+                plan_time_budget=time_budget, plan_node_budget=args.node_budget, record_path=args.record,
+                turbo=turbo)
     game.run()
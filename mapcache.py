@@ -0,0 +1,202 @@
+import argparse
+import hashlib
+import json
+import mmap
+import os
+import struct
+import sys
+import time
+
+os.environ.setdefault('PYGAME_HIDE_SUPPORT_PROMPT', '1')
+
+from distance import DistanceOracle
+
+MAGIC = b'PMCM'
+VERSION = 3
+EXTENSION = '.pmc'
+
+# magic, version, thứ tự byte của bảng khoảng cách (0 = little), sha1 của file .txt, độ dài JSON
+_HEADER = struct.Struct('<4sBB20sI')
+_BYTE_ORDER = 0 if sys.byteorder == 'little' else 1
+# Mỗi khối nhị phân bắt đầu ở offset chia hết cho 8 để cast memoryview sang 'H' / 'I'
+_ALIGN = 8
+
+# Đường dẫn tuyệt đối của map -> CompiledMap đã mở, dùng lại qua các ván / reset
+_loaded = {}
+
+
+def compiled_path(map_path):
+    """File đã biên dịch nằm cạnh file map: maps/x.txt -> maps/x.pmc."""
+    return os.path.splitext(map_path)[0] + EXTENSION
+
+
+def _digest(map_path):
+    with open(map_path, 'rb') as f:
+        return hashlib.sha1(f.read()).digest()
+
+
+class CompiledMap:
+    """Map đã tiền xử lý, đọc từ file .pmc qua mmap (chỉ đọc).
+
+    Với mỗi hướng xoay k giữ: grid lúc bắt đầu ván, góc teleport, exit, danh sách food
+    (thứ tự bit của FoodIndex) và các hàng bảng khoảng cách BFS. Bảng khoảng cách chỉ có
+    ở các hướng là owner (Maze.oracle_owner), hướng khác tra qua OracleView. DistanceOracle
+    của mỗi owner được tạo một lần rồi dùng chung cho mọi ván trên map này.
+    """
+
+    def __init__(self, path, buffer, digest, meta, offset):
+        self.path = path
+        self.digest = digest
+        self.width = meta['width']
+        self.height = meta['height']
+        self.actor_cells = [tuple(cell) for cell in meta['actors']]
+        self._buffer = buffer
+        self._view = memoryview(buffer)
+        self._offset = offset
+        self._orientations = meta['orientations']
+        self._oracles = [None] * 4
+
+    def _block(self, offset, length):
+        start = self._offset + offset
+        return self._view[start:start + length]
+
+    def size(self, k):
+        return tuple(self._orientations[k]['size'])
+
+    def grid(self, k):
+        width, height = self.size(k)
+        return self._block(self._orientations[k]['grid'], width * height)
+
+    def corners(self, k):
+        return [tuple(cell) for cell in self._orientations[k]['corners']]
+
+    def exit(self, k):
+        cell = self._orientations[k]['exit']
+        return tuple(cell) if cell else None
+
+    def food(self, k):
+        return [tuple(cell) for cell in self._orientations[k]['food']]
+
+    def oracle(self, k):
+        if self._oracles[k] is None:
+            info = self._orientations[k]
+            width, height = self.size(k)
+            typecode = info['typecode']
+            itemsize = 2 if typecode == 'H' else 4
+            rows = {(x, y): self._block(offset, width * height * itemsize).cast(typecode)
+                    for x, y, offset in info['rows']}
+            self._oracles[k] = DistanceOracle(self.grid(k), width, height,
+                                              corners=self.corners(k), rows=rows)
+        return self._oracles[k]
+
+
+def compile_map(map_path, out_path=None):
+    """Parse map, dựng FoodIndex / góc / bảng khoảng cách cho 4 hướng rồi ghi ra file .pmc."""
+    from maze import Maze
+    from search import PacmanSearchProblem
+
+    out_path = out_path or compiled_path(map_path)
+    digest = _digest(map_path)
+    maze = Maze(map_path, use_compiled=False)
+    problem = PacmanSearchProblem(maze)
+
+    blob = bytearray()
+
+    def put(data):
+        blob.extend(bytes(-len(blob) % _ALIGN))
+        offset = len(blob)
+        blob.extend(data)
+        return offset
+
+    orientations = []
+    for k in range(4):
+        oracle = problem._oracles[k]
+        # Hướng không phải owner không ghi bảng nào: dùng bảng của owner
+        owned = maze.oracle_owner(k) == k
+        orientations.append({
+            'size': maze.orientation_size(k),
+            'grid': put(maze.orientation_cells(k)),
+            'corners': maze.orientation_corners(k),
+            'exit': problem._exit_positions[k],
+            'food': problem._food_indexes[k].cells,
+            'typecode': oracle.typecode,
+            'rows': [[x, y, put(row.tobytes())] for (x, y), row in oracle._rows.items()] if owned else [],
+        })
+    meta = json.dumps({'width': maze.base_width, 'height': maze.base_height,
+                       'actors': maze._actor_cells, 'orientations': orientations},
+                      separators=(',', ':')).encode('utf-8')
+
+    head = _HEADER.pack(MAGIC, VERSION, _BYTE_ORDER, digest, len(meta))
+    padding = bytes(-(len(head) + len(meta)) % _ALIGN)
+    # Ghi ra file tạm rồi đổi tên: tiến trình khác không bao giờ đọc phải file ghi dở
+    tmp_path = f"{out_path}.{os.getpid()}.tmp"
+    with open(tmp_path, 'wb') as f:
+        f.write(head + meta + padding)
+        f.write(blob)
+    os.replace(tmp_path, out_path)
+    return out_path
+
+
+def _open(path, digest):
+    """CompiledMap từ file .pmc, None nếu không có file hoặc file không khớp map hiện tại."""
+    try:
+        with open(path, 'rb') as f:
+            buffer = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+    except (OSError, ValueError):
+        return None
+    if len(buffer) < _HEADER.size:
+        buffer.close()
+        return None
+    magic, version, byte_order, file_digest, meta_len = _HEADER.unpack_from(buffer)
+    if magic != MAGIC or version != VERSION or byte_order != _BYTE_ORDER or file_digest != digest:
+        buffer.close()
+        return None
+    meta = json.loads(buffer[_HEADER.size:_HEADER.size + meta_len])
+    offset = _HEADER.size + meta_len
+    offset += -offset % _ALIGN
+    return CompiledMap(path, buffer, digest, meta, offset)
+
+
+def load_compiled(map_path):
+    """CompiledMap của map_path; biên dịch lại nếu chưa có hoặc file .txt đã đổi nội dung.
+
+    Trả về None nếu không ghi được file .pmc (vd. thư mục chỉ đọc): khi đó Maze parse như cũ.
+    """
+    digest = _digest(map_path)
+    key = os.path.abspath(map_path)
+    compiled = _loaded.get(key)
+    if compiled is not None and compiled.digest == digest:
+        return compiled
+
+    path = compiled_path(map_path)
+    compiled = _open(path, digest)
+    if compiled is None:
+        try:
+            compile_map(map_path, path)
+        except OSError:
+            return None
+        compiled = _open(path, digest)
+    _loaded[key] = compiled
+    return compiled
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Biên dịch sẵn map (.txt -> .pmc) để game khởi động nhanh.")
+    parser.add_argument('maps', nargs='+', help="file map (.txt)")
+    parser.add_argument('--force', action='store_true', help="biên dịch lại kể cả khi file .pmc còn khớp")
+    args = parser.parse_args(argv)
+
+    for map_path in args.maps:
+        path = compiled_path(map_path)
+        if not args.force and _open(path, _digest(map_path)) is not None:
+            print(f"{map_path}: up to date ({path})")
+            continue
+        t0 = time.perf_counter()
+        compile_map(map_path, path)
+        print(f"{map_path}: compiled in {time.perf_counter() - t0:.3f}s -> {path} "
+              f"({os.path.getsize(path) / 1024:.1f} KiB)")
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,152 @@
+import argparse
+import random
+import sys
+from collections import deque
+
+EXIT_PLACEMENTS = ('far', 'near', 'random')
+
+
+def generate_maze(width, height, seed=None, corridor_density=1.0, loops=0, food=10,
+                  power_ups=0, ghosts=2, exit_placement='far'):
+    """Sinh map cùng định dạng file map (%, ., O, P, G, E), trả về danh sách hàng str.
+
+    corridor_density: tỉ lệ ô lưới (toạ độ lẻ) được nối vào mê cung, 0 < d <= 1.
+    loops: số bức tường bị đục thêm giữa hai hành lang để tạo vòng.
+    exit_placement: 'far' (xa P nhất), 'near' (gần P nhất) hoặc 'random'.
+    """
+    if width < 5 or height < 5:
+        raise ValueError("maze must be at least 5x5")
+    if not 0 < corridor_density <= 1:
+        raise ValueError("corridor_density must be in (0, 1]")
+    if exit_placement not in EXIT_PLACEMENTS:
+        raise ValueError(f"exit_placement must be one of {EXIT_PLACEMENTS}")
+
+    rng = random.Random(seed)
+    grid = [bytearray(b'%' * width) for _ in range(height)]
+
+    # Ô lưới ở toạ độ lẻ; tường giữa hai ô lưới kề nhau nằm ở điểm giữa
+    lattice = [(x, y) for y in range(1, height - 1, 2) for x in range(1, width - 1, 2)]
+    target = max(1, int(len(lattice) * corridor_density))
+
+    # Recursive backtracker (lặp) cho tới khi đủ số ô theo mật độ
+    start = rng.choice(lattice)
+    grid[start[1]][start[0]] = ord(' ')
+    carved = 1
+    stack = [start]
+    while stack and carved < target:
+        x, y = stack[-1]
+        options = []
+        for dx, dy in ((2, 0), (-2, 0), (0, 2), (0, -2)):
+            nx, ny = x + dx, y + dy
+            if 0 < nx < width - 1 and 0 < ny < height - 1 and grid[ny][nx] == ord('%'):
+                options.append((nx, ny))
+        if not options:
+            stack.pop()
+            continue
+        nx, ny = rng.choice(options)
+        grid[(y + ny) // 2][(x + nx) // 2] = ord(' ')
+        grid[ny][nx] = ord(' ')
+        carved += 1
+        stack.append((nx, ny))
+
+    # Chiều chẵn: hàng/cột trong cùng nằm ngoài lưới lẻ, nối nó vào ô lưới kề bên
+    # để mép map không thành tường đôi
+    if width % 2 == 0:
+        for y in range(1, height - 1, 2):
+            if grid[y][width - 3] == ord(' '):
+                grid[y][width - 2] = ord(' ')
+    if height % 2 == 0:
+        for x in range(1, width - 1, 2):
+            if grid[height - 3][x] == ord(' '):
+                grid[height - 2][x] = ord(' ')
+
+    # Đục thêm tường ngăn cách hai hành lang để có vòng
+    candidates = []
+    for y in range(1, height - 1):
+        for x in range(1, width - 1):
+            if grid[y][x] != ord('%'):
+                continue
+            if x % 2 == 0 and y % 2 == 1 and grid[y][x - 1] == ord(' ') and grid[y][x + 1] == ord(' '):
+                candidates.append((x, y))
+            elif x % 2 == 1 and y % 2 == 0 and grid[y - 1][x] == ord(' ') and grid[y + 1][x] == ord(' '):
+                candidates.append((x, y))
+    for x, y in rng.sample(candidates, min(loops, len(candidates))):
+        grid[y][x] = ord(' ')
+
+    open_cells = [(x, y) for y in range(height) for x in range(width) if grid[y][x] == ord(' ')]
+    needed = 2 + food + power_ups + ghosts
+    if len(open_cells) < needed:
+        raise ValueError(f"only {len(open_cells)} open cells, need {needed}")
+
+    pacman = rng.choice(open_cells)
+    dist = _bfs_distances(grid, pacman)
+    reachable = [c for c in open_cells if c in dist and c != pacman]
+    if exit_placement == 'far':
+        exit_pos = max(reachable, key=lambda c: (dist[c], c))
+    elif exit_placement == 'near':
+        exit_pos = min(reachable, key=lambda c: (dist[c], c))
+    else:
+        exit_pos = rng.choice(reachable)
+
+    free = [c for c in reachable if c != exit_pos]
+    rng.shuffle(free)
+    food_cells = free[:food]
+    power_cells = free[food:food + power_ups]
+    rest = free[food + power_ups:]
+    # Ma không đặt ngay sát P
+    ghost_pool = [c for c in rest if dist[c] > 3] or rest
+    if len(ghost_pool) < ghosts:
+        raise ValueError(f"not enough room for {ghosts} ghosts")
+    ghost_cells = ghost_pool[:ghosts]
+
+    for cells, char in ((food_cells, '.'), (power_cells, 'O'), (ghost_cells, 'G'),
+                        ([pacman], 'P'), ([exit_pos], 'E')):
+        for x, y in cells:
+            grid[y][x] = ord(char)
+
+    return [row.decode('ascii') for row in grid]
+
+
+def _bfs_distances(grid, start):
+    dist = {start: 0}
+    queue = deque([start])
+    height, width = len(grid), len(grid[0])
+    while queue:
+        x, y = queue.popleft()
+        for nx, ny in ((x + 1, y), (x - 1, y), (x, y + 1), (x, y - 1)):
+            if 0 <= nx < width and 0 <= ny < height and grid[ny][nx] != ord('%') and (nx, ny) not in dist:
+                dist[(nx, ny)] = dist[(x, y)] + 1
+                queue.append((nx, ny))
+    return dist
+
+
+def write_map(rows, path):
+    with open(path, 'w') as f:
+        for row in rows:
+            f.write(row + '\n')
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Sinh map Pacman ngẫu nhiên (có seed) để thử tải lớn.")
+    parser.add_argument('--width', type=int, default=41)
+    parser.add_argument('--height', type=int, default=41)
+    parser.add_argument('--seed', type=int, default=None)
+    parser.add_argument('--density', type=float, default=1.0, help="mật độ hành lang (0, 1]")
+    parser.add_argument('--loops', type=int, default=0, help="số vòng đục thêm")
+    parser.add_argument('--food', type=int, default=10)
+    parser.add_argument('--power-ups', type=int, default=0)
+    parser.add_argument('--ghosts', type=int, default=2)
+    parser.add_argument('--exit', dest='exit_placement', choices=EXIT_PLACEMENTS, default='far')
+    parser.add_argument('-o', '--output', required=True, help="file map .txt đầu ra")
+    args = parser.parse_args(argv)
+
+    rows = generate_maze(args.width, args.height, seed=args.seed, corridor_density=args.density,
+                         loops=args.loops, food=args.food, power_ups=args.power_ups,
+                         ghosts=args.ghosts, exit_placement=args.exit_placement)
+    write_map(rows, args.output)
+    print(f"Wrote {args.width}x{args.height} map to {args.output}")
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -1,76 +1,355 @@
 import pygame
+from collections import OrderedDict
 from settings import *
+from mapcache import load_compiled
+from sprites import SPRITES
+
+# Mã ô trong Maze.cells (trùng với ký tự trong file map)
+EMPTY = ord(' ')
+WALL = ord('%')
+FOOD = ord('.')
+POWER_UP = ord('O')
+PACMAN = ord('P')
+GHOST = ord('G')
+EXIT = ord('E')
+
+# Khi xoay maze, vị trí P/G ban đầu không còn ý nghĩa
+_CLEAR_ACTORS = bytes.maketrans(b'PG', b'  ')
+
+
+class MapView:
+    """Xem Maze.cells như danh sách hàng str (chỉ đọc), cho code cũ dùng map_data[y][x]."""
+
+    def __init__(self, maze):
+        self._maze = maze
+        # Mỗi hướng xoay giữ cache hàng riêng, xoay maze không phải decode lại
+        self._row_caches = [[None] * (maze.tile_height if k % 2 == 0 else maze.tile_width)
+                            for k in range(4)]
+        self._rows = self._row_caches[0]
+
+    def _select(self, orientation):
+        self._rows = self._row_caches[orientation]
+
+    def _invalidate(self, orientation, y):
+        self._row_caches[orientation][y] = None
+
+    def _row(self, y):
+        row = self._rows[y]
+        if row is None:
+            width = self._maze.tile_width
+            row = self._maze.cells[y * width:(y + 1) * width].decode('ascii')
+            self._rows[y] = row
+        return row
+
+    def __len__(self):
+        return self._maze.tile_height
+
+    def __getitem__(self, y):
+        if isinstance(y, slice):
+            return [self._row(i) for i in range(*y.indices(len(self)))]
+        if y < 0:
+            y += len(self)
+        if not 0 <= y < len(self):
+            raise IndexError("map row out of range")
+        return self._row(y)
+
+    def __iter__(self):
+        for y in range(len(self)):
+            yield self._row(y)
+
+
+class MazeSnapshot:
+    """Lát cắt chỉ đọc của Maze ở một hướng xoay cố định, cho planner chạy ở thread khác.
+
+    Dùng chung bytearray của hướng đó với Maze (tường không bao giờ đổi, food chỉ bị xoá),
+    nên tạo snapshot không phải chép grid; xoay maze sau đó không ảnh hưởng snapshot.
+    """
+
+    def __init__(self, maze):
+        self._maze = maze
+        self.orientation = maze.orientation
+        self.cells = maze.cells
+        self.tile_width = maze.tile_width
+        self.tile_height = maze.tile_height
+        self.teleport_corners = list(maze.teleport_corners)
+        self.layout_version = maze.layout_version
+
+    def cell(self, x, y):
+        if 0 <= x < self.tile_width and 0 <= y < self.tile_height:
+            return self.cells[y * self.tile_width + x]
+        return None
+
+    def is_wall(self, x, y):
+        return self.cell(x, y) in (WALL, None)
+
+    def to_base(self, x, y):
+        return self._maze.to_base(x, y, self.orientation)
+
+    def from_base(self, x, y):
+        return self._maze.from_base(x, y, self.orientation)
+
 
 class Maze:
-    def __init__(self, filepath):
-        self.map_data = []
-        with open(filepath, 'r') as f:
-            for line in f:
-                self.map_data.append(line.strip())
+    def __init__(self, filepath, use_compiled=True):
+        # Map đã biên dịch (mapcache.py): chỉ chép grid ra, không parse / xoay / tìm góc lại
+        self.compiled = load_compiled(filepath) if use_compiled else None
+        if self.compiled is not None:
+            compiled = self.compiled
+            self.base_width = compiled.width
+            self.base_height = compiled.height
+            self._grids = [bytearray(compiled.grid(k)) for k in range(4)]
+            self._actor_cells = list(compiled.actor_cells)
+            self._corners = [compiled.corners(k) for k in range(4)]
+        else:
+            self._parse(filepath)
 
-        self.tile_width = len(self.map_data[0])
-        self.tile_height = len(self.map_data)
+        self.orientation = 0
+        self.cells = self._grids[0]
+        self.tile_width = self.base_width
+        self.tile_height = self.base_height
+        self.map_data = MapView(self)
         self.width = self.tile_width * TILE_SIZE
         self.height = self.tile_height * TILE_SIZE
+        # Tăng mỗi lần xoay để các bảng dựng từ map biết mà dựng lại
+        self.layout_version = 0
+        # Số food / power-up đã bị ăn (recorder dùng để đánh dấu frame)
+        self.eaten = 0
+        # (hướng, cx, cy) -> Surface của một khối nền, LRU tối đa CHUNK_CACHE khối
+        self._chunks = OrderedDict()
+        # Ô food vừa bị ăn (toạ độ pixel trên map) để Game vẽ lại phần đó
+        self.dirty_rects = []
+
+    def _parse(self, filepath):
+        rows = []
+        with open(filepath, 'r') as f:
+            for line in f:
+                rows.append(line.strip())
+
+        # Lưu cả map trong một bytearray (hàng nối tiếp hàng), hàng ngắn được đệm bằng tường
+        width = max(len(row) for row in rows)
+        base = bytearray("".join(row.ljust(width, '%') for row in rows), 'ascii')
+        self.base_width = width
+        self.base_height = len(rows)
 
-    def draw(self, surface):
-        for row_idx, row in enumerate(self.map_data):
-            for col_idx, tile in enumerate(row):
-                x = col_idx * TILE_SIZE
-                y = row_idx * TILE_SIZE
-                
-                rect = pygame.Rect(x, y, TILE_SIZE, TILE_SIZE)
-
-                if tile == '%':  # Tường
-                    # Vẽ nền tối
-                    pygame.draw.rect(surface, DARK_WALL, rect) 
-                    # Vẽ đường viền sáng cho cảm giác 3D
-                    pygame.draw.rect(surface, BLUE, rect, 2) 
-
-                elif tile == '.':  # Food (Chấm nhỏ)
-                    pygame.draw.circle(surface, FOOD_COLOR, 
-                                       (x + TILE_SIZE // 2, y + TILE_SIZE // 2), 
-                                       3) # Giảm bán kính 
-                    
-                elif tile == 'O': # Power-up (Chấm lớn)
-                    # Thêm hiệu ứng nhấp nháy/vòng tròn ngoài
-                    pygame.draw.circle(surface, POWER_UP_COLOR, 
-                                       (x + TILE_SIZE // 2, y + TILE_SIZE // 2), 
-                                       TILE_SIZE // 2 - 4, 1) # Vòng tròn ngoài
-                    pygame.draw.circle(surface, FOOD_COLOR, 
-                                       (x + TILE_SIZE // 2, y + TILE_SIZE // 2), 
-                                       TILE_SIZE // 4) # Chấm đặc bên trong
-
-                elif tile == 'E':  # Cổng ra
-                    GREEN_LIGHT = (50, 255, 50)
-                    pygame.draw.rect(surface, GREEN_LIGHT, rect)
-                    pygame.draw.rect(surface, (0, 100, 0), rect, 2) # Viền tối
+        # Dựng sẵn cả 4 hướng xoay; xoay maze chỉ đổi self.orientation
+        self._grids = [base]
+        for k in range(1, 4):
+            prev = self._grids[-1]
+            prev_width = self.base_width if k % 2 == 1 else self.base_height
+            # Hàng mới thứ x là cột x cũ đọc từ dưới lên
+            rotated = b"".join(prev[x::prev_width][::-1] for x in range(prev_width))
+            self._grids.append(bytearray(rotated.translate(_CLEAR_ACTORS)))
+        self._actor_cells = [(i % width, i // width) for i, c in enumerate(base) if c in (PACMAN, GHOST)]
+
+        # Ô teleport: ô đi được đầu tiên khi quét từ mỗi góc map, tính sẵn cho từng hướng
+        self._corners = [self._find_corners(k) for k in range(4)]
+
+    def _render_chunk(self, cx, cy):
+        size = CHUNK_TILES * TILE_SIZE
+        chunk = pygame.Surface((size, size))
+        if pygame.display.get_surface() is not None:
+            chunk = chunk.convert()
+        chunk.fill(BLACK)
+        # Tường, cổng ra, food, power-up là sprite vẽ sẵn: cả khối là một lời gọi blits
+        sprites = {tile: SPRITES.tile(tile) for tile in '%E.O'}
+        x0, y0 = cx * CHUNK_TILES, cy * CHUNK_TILES
+        chunk.blits([(sprites[tile], ((tx - x0) * TILE_SIZE, (ty - y0) * TILE_SIZE))
+                     for ty in range(y0, min(y0 + CHUNK_TILES, self.tile_height))
+                     for tx, tile in enumerate(self.map_data[ty][x0:x0 + CHUNK_TILES], x0)
+                     if tile in sprites], doreturn=False)
+        return chunk
+
+    def get_chunk(self, cx, cy):
+        """Khối nền (tường, exit, food) thứ (cx, cy) của hướng hiện tại, vẽ khi cần lần đầu."""
+        key = (self.orientation, cx, cy)
+        chunk = self._chunks.get(key)
+        if chunk is None:
+            chunk = self._render_chunk(cx, cy)
+            self._chunks[key] = chunk
+            if len(self._chunks) > CHUNK_CACHE:
+                self._chunks.popitem(last=False)
+        else:
+            self._chunks.move_to_end(key)
+        return chunk
+
+    def take_dirty_rects(self):
+        rects = self.dirty_rects
+        self.dirty_rects = []
+        return rects
+
+    def draw(self, surface, view=None, clip=None):
+        """Vẽ nền của vùng map view (pixel, mặc định cả map) lên surface, góc view ở (0, 0).
+
+        Chỉ các khối giao với view (và clip, nếu có) được vẽ: chi phí theo kích thước
+        khung nhìn chứ không theo kích thước map.
+        """
+        if view is None:
+            view = pygame.Rect(0, 0, self.width, self.height)
+        region = view.clip(pygame.Rect(0, 0, self.width, self.height))
+        if clip is not None:
+            region = region.clip(clip)
+        if region.width <= 0 or region.height <= 0:
+            return
+        size = CHUNK_TILES * TILE_SIZE
+        for cy in range(region.top // size, (region.bottom - 1) // size + 1):
+            for cx in range(region.left // size, (region.right - 1) // size + 1):
+                chunk_rect = pygame.Rect(cx * size, cy * size, size, size)
+                part = chunk_rect.clip(region)
+                surface.blit(self.get_chunk(cx, cy), (part.x - view.x, part.y - view.y),
+                             part.move(-chunk_rect.x, -chunk_rect.y))
+
+    def cell(self, x, y):
+        """Mã ô tại (x, y), None nếu nằm ngoài map."""
+        if 0 <= x < self.tile_width and 0 <= y < self.tile_height:
+            return self.cells[y * self.tile_width + x]
+        return None
+
+    def to_base(self, x, y, orientation=None):
+        """Đổi toạ độ của một hướng xoay về toạ độ của map gốc (hướng 0)."""
+        k = self.orientation if orientation is None else orientation
+        if k == 1:
+            return y, self.base_height - 1 - x
+        if k == 2:
+            return self.base_width - 1 - x, self.base_height - 1 - y
+        if k == 3:
+            return self.base_width - 1 - y, x
+        return x, y
+
+    def from_base(self, x, y, orientation=None):
+        """Đổi toạ độ map gốc sang toạ độ của hướng xoay orientation."""
+        k = self.orientation if orientation is None else orientation
+        if k == 1:
+            return self.base_height - 1 - y, x
+        if k == 2:
+            return self.base_width - 1 - x, self.base_height - 1 - y
+        if k == 3:
+            return y, self.base_width - 1 - x
+        return x, y
+
+    def orientation_size(self, orientation):
+        if orientation % 2 == 0:
+            return self.base_width, self.base_height
+        return self.base_height, self.base_width
+
+    def orientation_cells(self, orientation):
+        return self._grids[orientation]
+
+    def orientation_corners(self, orientation):
+        return self._corners[orientation]
+
+    def _graph_key(self, orientation):
+        """Đồ thị đi lại của một hướng theo toạ độ map gốc: (góc teleport, các cặp ô nối wrap-around).
+
+        Tường không đổi khi xoay nhưng wrap-around luôn theo chiều ngang của hướng đang xét,
+        và góc teleport là ô đi được đầu tiên khi quét theo hàng của hướng đó.
+        """
+        cells = self._grids[orientation]
+        width, height = self.orientation_size(orientation)
+        corners = frozenset(self.to_base(x, y, orientation) for x, y in self._corners[orientation])
+        wraps = frozenset(frozenset((self.to_base(0, y, orientation), self.to_base(width - 1, y, orientation)))
+                          for y in range(height)
+                          if cells[y * width] != WALL and cells[y * width + width - 1] != WALL)
+        return corners, wraps
+
+    def oracle_owner(self, orientation):
+        """Hướng nhỏ nhất có cùng đồ thị với orientation: khoảng cách giữa hai ô bất kỳ là như nhau,
+        nên bảng khoảng cách của hướng đó dùng được cho orientation (qua phép đổi toạ độ)."""
+        key = self._graph_key(orientation)
+        return next(k for k in range(orientation + 1) if self._graph_key(k) == key)
+
+    def orientation_map(self, orientation, owner):
+        """Hàm (x, y) của hướng orientation -> (x, y) tương ứng của hướng owner."""
+        def remap(x, y):
+            return self.from_base(*self.to_base(x, y, orientation), owner)
+        return remap
+
+    @property
+    def teleport_corners(self):
+        """[trên-trái, trên-phải, dưới-trái, dưới-phải] của hướng hiện tại."""
+        return self._corners[self.orientation]
+
+    def _find_corners(self, orientation):
+        cells = self._grids[orientation]
+        width, height = self.orientation_size(orientation)
+
+        def find_corner(start_x, start_y, dx, dy):
+            for offset_y in range(height):
+                y = start_y + dy * offset_y
+                for offset_x in range(width):
+                    x = start_x + dx * offset_x
+                    if cells[y * width + x] != WALL:
+                        return (x, y)
+            return (start_x, start_y)
+
+        return [
+            find_corner(0, 0, +1, +1),
+            find_corner(width - 1, 0, -1, +1),
+            find_corner(0, height - 1, +1, -1),
+            find_corner(width - 1, height - 1, -1, -1),
+        ]
+
+    def snapshot(self):
+        return MazeSnapshot(self)
+
+    def set_cell(self, x, y, code):
+        # Ghi vào cả 4 hướng để lúc xoay không phải chép lại grid
+        bx, by = self.to_base(x, y)
+        for k in range(4):
+            kx, ky = self.from_base(bx, by, k)
+            width = self.orientation_size(k)[0]
+            self._grids[k][ky * width + kx] = code
+            self.map_data._invalidate(k, ky)
+
+    def is_wall(self, x, y):
+        return self.cell(x, y) in (WALL, None)
+
+    def find_all(self, code, orientation=None):
+        if orientation is None:
+            cells, width = self.cells, self.tile_width
+        else:
+            cells, width = self._grids[orientation], self.orientation_size(orientation)[0]
+        positions = []
+        i = cells.find(code)
+        while i != -1:
+            positions.append((i % width, i // width))
+            i = cells.find(code, i + 1)
+        return positions
 
     def remove_food(self, pos):
         x, y = int(pos[0]), int(pos[1])
-        if 0 <= y < len(self.map_data) and 0 <= x < len(self.map_data[y]):
-            row = list(self.map_data[y])
-            row[x] = ' '  
-            self.map_data[y] = "".join(row)
+        if 0 <= y < self.tile_height and 0 <= x < self.tile_width:
+            self.set_cell(x, y, EMPTY)
+            self.eaten += 1
+            self.dirty_rects.append(pygame.Rect(x * TILE_SIZE, y * TILE_SIZE, TILE_SIZE, TILE_SIZE))
+            # Ô food không có gì tĩnh bên dưới: xoá trên các khối đã vẽ (mọi hướng) bằng màu nền
+            bx, by = self.to_base(x, y)
+            for k in range(4):
+                kx, ky = self.from_base(bx, by, k)
+                chunk = self._chunks.get((k, kx // CHUNK_TILES, ky // CHUNK_TILES))
+                if chunk is not None:
+                    chunk.fill(BLACK, ((kx % CHUNK_TILES) * TILE_SIZE, (ky % CHUNK_TILES) * TILE_SIZE,
+                                       TILE_SIZE, TILE_SIZE))
 
     def rotate_maze_90_right(self, pacman=None, ghosts=None):
 
-        if not self.map_data:
+        if not self.cells:
             print("[WARN] Maze empty, cannot rotate.")
             return
 
-        max_len = max(len(row) for row in self.map_data)
-        normalized = [row.ljust(max_len, '%') for row in self.map_data]
-
-        old_height = len(normalized)
+        old_height = self.tile_height
 
-        rotated = ["".join(row) for row in zip(*normalized[::-1])]
-        self.map_data = rotated
+        if self._actor_cells:
+            # Như khi xoay lần đầu: vị trí P/G ban đầu bị xoá khỏi map
+            for bx, by in self._actor_cells:
+                self.set_cell(*self.from_base(bx, by), EMPTY)
+            self._actor_cells = []
 
-        for i,row in enumerate(self.map_data):
-            self.map_data[i] = row.replace('P',' ').replace('G',' ')
+        self.orientation = (self.orientation + 1) % 4
+        self.cells = self._grids[self.orientation]
+        self.map_data._select(self.orientation)
 
         self.tile_width, self.tile_height = self.tile_height, self.tile_width
+        self.layout_version += 1
         self.width = self.tile_width * TILE_SIZE
         self.height = self.tile_height * TILE_SIZE
 
@@ -88,7 +367,10 @@ class Maze:
                 old_dir = pacman.direction
                 pacman.direction = pygame.Vector2(-old_dir.y, old_dir.x)
 
-        if ghosts is not None:
+        if hasattr(ghosts, "rotate"):
+            # GhostSwarm tự xoay cả đàn (và lưới occupancy)
+            ghosts.rotate(old_height)
+        elif ghosts is not None:
             for g in ghosts:
                 x, y = int(g.grid_pos.x), int(g.grid_pos.y)
                 new_x = old_height - 1 - y
@@ -1,5 +1,7 @@
 import pygame
 from settings import *
+from maze import FOOD, POWER_UP, WALL
+from sprites import SPRITES
 import random
 import time
 
@@ -42,16 +44,12 @@ class Pacman:
             last_grid_pos = self.grid_pos
             self.grid_pos = new_grid_pos
 
-            y, x = int(self.grid_pos.y), int(self.grid_pos.x)
-            if 0 <= y < len(self.game.maze.map_data):
-                row = self.game.maze.map_data[y]
-                if 0 <= x < len(row):
-                    current_tile_char = row[x]
-                    if current_tile_char == '.':
-                        self.game.maze.remove_food(self.grid_pos)
-                    elif current_tile_char == 'O':
-                        self.game.maze.remove_food(self.grid_pos)
-                        self.power_up_timer = 5
+            current_tile = self.game.maze.cell(int(self.grid_pos.x), int(self.grid_pos.y))
+            if current_tile == FOOD:
+                self.game.maze.remove_food(self.grid_pos)
+            elif current_tile == POWER_UP:
+                self.game.maze.remove_food(self.grid_pos)
+                self.power_up_timer = 5
 
             if self.power_up_timer > 0 and self.grid_pos != last_grid_pos:
                 self.power_up_timer -= 1
@@ -69,16 +67,14 @@ class Pacman:
             elif self.direction.y == 1:
                 self.game.real_path.append("South")
 
-            if self.step_count % 30 == 0:
+            if self.step_count % MAZE_ROTATION_STEPS == 0:
                 try:
                     self.game.maze.rotate_maze_90_right(
                         pacman=self,
                         ghosts=getattr(self.game, "ghosts", None)
                     )
 
-                    self.game.screen = pygame.display.set_mode(
-                        (self.game.maze.width, self.game.maze.height)
-                    )
+                    self.game.on_maze_rotated()
 
                     self.pix_pos = self.grid_pos * TILE_SIZE
 
@@ -93,28 +89,7 @@ class Pacman:
                     print(f"[WARN] Maze rotation failed safely: {e}")
 
             # === TELEPORT GÓC ===
-            def find_corner(start_x, start_y, dx, dy):
-                height = len(self.game.maze.map_data)
-                width = max(len(r) for r in self.game.maze.map_data)
-
-                for offset_y in range(0, height):
-                    for offset_x in range(0, width):
-                        x = start_x + dx * offset_x
-                        y = start_y + dy * offset_y
-                        if not (0 <= int(y) < height):
-                            continue
-                        row = self.game.maze.map_data[int(y)]
-                        if not (0 <= int(x) < len(row)):
-                            continue
-                        if row[int(x)] != '%':
-                            return pygame.Vector2(x, y)
-                return pygame.Vector2(start_x, start_y)
-
-            top_left = find_corner(0, 0, +1, +1)
-            top_right = find_corner(self.game.maze.tile_width - 1, 0, -1, +1)
-            bottom_left = find_corner(0, self.game.maze.tile_height - 1, +1, -1)
-            bottom_right = find_corner(self.game.maze.tile_width - 1, self.game.maze.tile_height - 1, -1, -1)
-            corners = [top_left, top_right, bottom_left, bottom_right]
+            corners = [pygame.Vector2(c) for c in self.game.maze.teleport_corners]
 
             for corner in corners:
                 if self.grid_pos == corner:
@@ -139,7 +114,7 @@ class Pacman:
                         self.direction = move_dir
                     break
 
-    def draw(self):
+    def draw(self, offset=(0, 0)):
         now = time.time()
         is_flashing = (now - self.last_teleport_time) < self.teleport_flash_duration
 
@@ -150,16 +125,18 @@ class Pacman:
         else:
             color = YELLOW
 
-        pygame.draw.circle(
-            self.game.screen,
-            color,
-            (int(self.pix_pos.x) + TILE_SIZE // 2, int(self.pix_pos.y) + TILE_SIZE // 2),
-            TILE_SIZE // 2 - 2
-        )
+        self.game.screen.blit(SPRITES.actor(color),
+                              (int(self.pix_pos.x) - offset[0], int(self.pix_pos.y) - offset[1]))
 
     def move(self, direction):
         self.stored_direction = direction
 
+    def stop(self):
+        """Đứng lại ở ô hiện tại; đang ở giữa hai ô thì đi nốt tới ô kế rồi mới dừng được."""
+        self.stored_direction = None
+        if self.pix_pos.x % TILE_SIZE == 0 and self.pix_pos.y % TILE_SIZE == 0:
+            self.direction = pygame.Vector2(0, 0)
+
     def can_change_direction(self):
         if abs(self.pix_pos.x % TILE_SIZE - 0) < self.speed or abs(self.pix_pos.x % TILE_SIZE - TILE_SIZE) < self.speed:
             if abs(self.pix_pos.y % TILE_SIZE - 0) < self.speed or abs(self.pix_pos.y % TILE_SIZE - TILE_SIZE) < self.speed:
@@ -172,15 +149,12 @@ class Pacman:
         if direction is None or (direction.x == 0 and direction.y == 0):
             return False
         next_grid_pos = self.grid_pos + direction
-        y, x = int(next_grid_pos.y), int(next_grid_pos.x)
-        if not (0 <= y < len(self.game.maze.map_data)):
-            return False
-        row = self.game.maze.map_data[y]
-        if not (0 <= x < len(row)):
+        tile = self.game.maze.cell(int(next_grid_pos.x), int(next_grid_pos.y))
+        if tile is None:
             return False
         if self.power_up_timer > 0:
             return True
-        return row[x] != '%'
+        return tile != WALL
     def at_center_of_tile(self):
         TILE = TILE_SIZE if 'TILE_SIZE' in globals() else 24
         cx = self.grid_pos.x * TILE + TILE / 2
@@ -0,0 +1,433 @@
+import threading
+import time
+from collections import Counter
+from itertools import accumulate
+
+from settings import AUTO_REPLAN_GHOST_DISTANCE, AUTO_REPLAN_LOOKAHEAD
+from search import MSTCache, SearchCancelled, SearchStats, _a_star, _anytime_a_star, _path_to_exit
+
+_DELTAS = {'West': (-1, 0), 'East': (1, 0), 'North': (0, -1), 'South': (0, 1)}
+
+class IncrementalPlanner:
+    """Giữ kế hoạch của lần tìm trước và chỉ sửa phần bị ảnh hưởng.
+
+    Kế hoạch là một nhánh của cây A*: states[i] --actions[i]/costs[i]--> states[i + 1].
+    Mỗi lần gọi plan():
+      - start không nằm trên kế hoạch (teleport, food bị ăn ngoài kế hoạch, maze xoay)
+        -> tìm lại từ đầu;
+      - chi phí mọi cạnh còn lại không đổi -> dùng lại phần đuôi, không tìm kiếm;
+      - có cạnh đổi chi phí (ma di chuyển, hết power-up) -> A* từ start, được phép
+        nối vào phần đuôi sau cạnh bị đổi cuối cùng.
+
+    Có time_budget (giây) hoặc node_budget thì mọi lần phải tìm đều dùng ARA*
+    (_anytime_a_star): lời giải tốt nhất trong ngân sách, cận chênh lệch ở last_bound.
+    Hết ngân sách trước lời giải đầu tiên thì trả về kế hoạch dở (last_kind = 'partial',
+    last_bound = None) kết thúc bằng 'Stop'; lần plan() sau luôn tìm lại.
+    """
+
+    def __init__(self, problem, time_budget=None, node_budget=None, to_exit=True):
+        self.problem = problem
+        # to_exit=False: kế hoạch dừng ở goal, không nối thêm đường ra exit
+        self.to_exit = to_exit
+        self.time_budget = time_budget
+        self.node_budget = node_budget
+        self.full_replans = 0
+        self.repairs = 0
+        self.reuses = 0
+        # Lần plan() gần nhất: 'reuse' | 'repair' | 'full' | 'anytime' | 'partial' và bộ đếm của nó
+        self.last_kind = None
+        self.last_stats = SearchStats()
+        # Cận chênh lệch so với tối ưu của kế hoạch đang giữ (1.0 = A* đầy đủ)
+        self.last_bound = None
+        self.clear()
+
+    @property
+    def budgeted(self):
+        return self.time_budget is not None or self.node_budget is not None
+
+    def clear(self):
+        self._states = []
+        self._actions = []
+        self._costs = []
+        self._index = {}
+        self._tail = []
+        self._version = None
+        self._last_k = 0
+        # Kế hoạch đang giữ là kế hoạch dở (chưa tới goal): không dùng lại
+        self._partial = False
+
+    def plan(self, start_state, cancel=None):
+        """Trả về (path, cost) giống a_star_search(problem, return_cost=True).
+
+        cancel: threading.Event; nếu bị set giữa lúc tìm thì ném SearchCancelled.
+        """
+        self.problem.update_danger_field()
+        self.last_stats = SearchStats()
+        version = getattr(self.problem.maze, "layout_version", 0)
+        k = self._index.get(start_state) if self._version == version and not self._partial else None
+        if k is None:
+            if self.budgeted:
+                return self._anytime_replan(start_state, cancel)
+            return self._full_replan(start_state, cancel)
+
+        changed = None
+        for i in range(k, len(self._actions)):
+            cost = self._edge_cost(i)
+            if cost != self._costs[i]:
+                self._costs[i] = cost
+                changed = i
+
+        if changed is None:
+            self.reuses += 1
+            self.last_kind = 'reuse'
+            return self._result(k)
+
+        if self.budgeted:
+            return self._anytime_replan(start_state, cancel)
+
+        # Các state sau cạnh bị đổi cuối cùng vẫn có phần đuôi hợp lệ
+        splice = {}
+        remaining = len(self._tail) - 1
+        j = len(self._states) - 1
+        while j > changed:
+            splice.setdefault(self._states[j], remaining)
+            j -= 1
+            if j > changed:
+                remaining += self._costs[j]
+
+        self.last_kind = 'repair'
+        result = _a_star(self.problem, start_state, splice, self.last_stats, cancel)
+        if result is None:
+            self.clear()
+            return [], 0
+
+        node, _, spliced = result
+        self.repairs += 1
+        self.last_bound = 1.0
+        if not spliced:
+            self._store(node)
+            return self._result(0)
+
+        j = self._index[node.state]
+        prefix_states, prefix_actions, prefix_costs = self._unwind(node)
+        self._set_plan(prefix_states + self._states[j + 1:],
+                       prefix_actions + self._actions[j:],
+                       prefix_costs + self._costs[j:],
+                       self._tail)
+        return self._result(0)
+
+    def _full_replan(self, start_state, cancel=None):
+        self.full_replans += 1
+        self.last_kind = 'full'
+        result = _a_star(self.problem, start_state, stats=self.last_stats, cancel=cancel)
+        if result is None:
+            self.clear()
+            return [], 0
+        self.last_bound = 1.0
+        self._store(result[0])
+        return self._result(0)
+
+    def _anytime_replan(self, start_state, cancel=None):
+        self.full_replans += 1
+        self.last_kind = 'anytime'
+        deadline = None
+        if self.time_budget is not None:
+            deadline = time.perf_counter() + self.time_budget
+        result = _anytime_a_star(self.problem, start_state, deadline=deadline,
+                                 node_budget=self.node_budget, stats=self.last_stats,
+                                 cancel=cancel, partial=True)
+        if result is None:
+            self.clear()
+            return [], 0
+        node, _, self.last_bound = result
+        if self.last_bound is None:
+            # Chưa tới goal: đi hết đoạn đầu rồi lập lại
+            self.last_kind = 'partial'
+            self._set_plan(*self._unwind(node), ['Stop'])
+            self._partial = True
+            return self._result(0)
+        self._store(node)
+        return self._result(0)
+
+    def _store(self, node):
+        states, actions, costs = self._unwind(node)
+        tail = []
+        exit_pos = self.problem.exit_pos
+        if exit_pos and self.to_exit:
+            tail = _path_to_exit(self.problem, node.state[0], exit_pos)
+        self._set_plan(states, actions, costs, tail + ['Stop'])
+
+    def _set_plan(self, states, actions, costs, tail):
+        self._states = states
+        self._actions = actions
+        self._costs = costs
+        self._tail = tail
+        self._partial = False
+        self._index = {}
+        for i, state in enumerate(states):
+            self._index.setdefault(state, i)
+        self._version = getattr(self.problem.maze, "layout_version", 0)
+
+    def _unwind(self, node):
+        states, actions, costs = [], [], []
+        while node.parent is not None:
+            states.append(node.state)
+            actions.append(node.action)
+            costs.append(node.g - node.parent.g)
+            node = node.parent
+        states.append(node.state)
+        states.reverse()
+        actions.reverse()
+        costs.reverse()
+        return states, actions, costs
+
+    def _edge_cost(self, i):
+        target = self._states[i + 1]
+        action = self._actions[i]
+        for next_state, next_action, cost in self.problem.get_successors(self._states[i]):
+            if next_state == target and next_action == action:
+                return cost
+        return None
+
+    def _result(self, k):
+        self._last_k = k
+        path = self._actions[k:] + self._tail
+        cost = sum(self._costs[k:]) + len(self._tail) - 1
+        return path, cost
+
+    def last_costs(self):
+        """Chi phí từng action của path vừa trả về ('Stop' cuối = 0)."""
+        if not self._states:
+            return []
+        return self._costs[self._last_k:] + [1] * (len(self._tail) - 1) + [0]
+
+    def last_states(self):
+        """State trước mỗi action của path vừa trả về (phần đường ra exit có food = 0)."""
+        if not self._states:
+            return []
+        states = self._states[self._last_k:]
+        (x, y), mask = states[-1]
+        for action in self._tail[:-1]:
+            dx, dy = _DELTAS[action]
+            x, y = x + dx, y + dy
+            states.append(((x, y), mask))
+        return states
+
+
+class PlanFollower:
+    """Đi theo một kế hoạch đầy đủ, chỉ yêu cầu lập lại khi có sự kiện.
+
+    events = (layout_version, thời điểm teleport, đang power-up) do game cung cấp.
+    follow() trả về None (cần lập lại, lý do ở last_trigger) khi: chưa có kế hoạch,
+    maze xoay, teleport, power-up bật/tắt, state rời kế hoạch (food bị ăn ngoài kế
+    hoạch -> 'food'), đã tới cuối kế hoạch mà game chưa kết thúc, có ma mới đi vào
+    bán kính radius quanh lookahead bước tới, có ma đứng ngay trên các bước đó, đã đi
+    hết horizon bước của kế hoạch (số bước tới lần xoay maze kế tiếp lúc nhận kế hoạch
+    -> 'horizon', mỗi kế hoạch một lần), hoặc Pacman quay lại một state đã đi qua mà số
+    food chưa giảm ('cycle').
+    """
+
+    def __init__(self, radius=AUTO_REPLAN_GHOST_DISTANCE, lookahead=AUTO_REPLAN_LOOKAHEAD):
+        self.radius = radius
+        self.lookahead = lookahead
+        self.follows = 0
+        self.triggers = Counter()
+        self.last_trigger = None
+        self.clear()
+
+    def clear(self):
+        self._path = []
+        self._positions = []
+        self._index = {}
+        self._cum = [0]
+        self._limit = None
+        self._events = None
+        self._near = frozenset()
+        # Các (state, hướng maze) đã đi qua kể từ lần số food giảm gần nhất
+        self._food = None
+        self._seen = set()
+        self._last = None
+
+    def adopt(self, path, states, costs, events, ghost_cells, horizon=None):
+        """Nhận kế hoạch mới: path[i] là action đi từ states[i] với chi phí costs[i]
+        (như planner.last_states() / last_costs()); chỉ đi tới bước horizon nếu có."""
+        self._path = path
+        self._positions = [state[0] for state in states]
+        self._index = {}
+        for i, state in enumerate(states):
+            self._index.setdefault(state, i)
+        self._cum = list(accumulate(costs, initial=0))
+        self._limit = horizon
+        self._events = events
+        self._near = self._ghosts_near(self._positions[:self.lookahead + 1], ghost_cells)
+
+    def remaining_cost(self, k):
+        """Chi phí phần kế hoạch từ bước k tới cuối."""
+        return self._cum[-1] - self._cum[k]
+
+    def step_at(self, state):
+        """(action, chi phí còn lại) nếu state nằm trên kế hoạch đang giữ, không xét sự kiện."""
+        k = self._index.get(state)
+        if k is None:
+            return None
+        return self._path[k], self.remaining_cost(k)
+
+    def follow(self, state, events, ghost_cells):
+        """(action, chi phí còn lại) theo kế hoạch đang giữ, None nếu phải lập lại."""
+        reason = self._trigger(state, events, ghost_cells, self._revisit(state, events[0]))
+        self.last_trigger = reason
+        if reason is not None:
+            self.triggers[reason] += 1
+            return None
+        self.follows += 1
+        k = self._index[state]
+        return self._path[k], self.remaining_cost(k)
+
+    def _revisit(self, state, layout_version):
+        """True nếu state (cùng hướng maze) đã gặp mà food chưa giảm; các frame liền nhau ở cùng ô không tính."""
+        food = state[1].bit_count()
+        if food != self._food:
+            self._food = food
+            self._seen = set()
+        key = (state, layout_version % 4)
+        if key == self._last:
+            return False
+        self._last = key
+        if key in self._seen:
+            return True
+        self._seen.add(key)
+        return False
+
+    def _trigger(self, state, events, ghost_cells, revisit=False):
+        if not self._path:
+            return 'no_plan'
+        if revisit:
+            return 'cycle'
+        layout_version, teleport_time, powered = events
+        if layout_version != self._events[0]:
+            return 'rotation'
+        if teleport_time != self._events[1]:
+            return 'teleport'
+        if powered != self._events[2]:
+            return 'power'
+        k = self._index.get(state)
+        if k is None:
+            return 'food' if state[0] in self._positions else 'off_plan'
+        if k == len(self._path) - 1:
+            return 'end'
+        cells = self._positions[k:k + self.lookahead + 1]
+        if self._ghosts_near(cells, ghost_cells) - self._near:
+            return 'ghost'
+        if any(ghost in cells for ghost in ghost_cells):
+            return 'ghost'
+        if self._limit is not None and k >= self._limit:
+            return 'horizon'
+        return None
+
+    def _ghosts_near(self, cells, ghost_cells):
+        radius = self.radius
+        return frozenset(g for g in ghost_cells
+                         if any(abs(g[0] - x) + abs(g[1] - y) <= radius for x, y in cells))
+
+
+class PlanResult:
+    """Kế hoạch do BackgroundPlanner công bố: path[i] là action đi từ states[i] với chi phí costs[i]."""
+
+    def __init__(self, seq, start_state, path, cost, states, costs, layout_version, kind, stats,
+                 elapsed, bound=None):
+        self.seq = seq
+        self.start_state = start_state
+        self.path = path
+        self.cost = cost
+        self.states = states
+        self.costs = costs
+        self.layout_version = layout_version
+        self.kind = kind
+        self.stats = stats
+        self.elapsed = elapsed
+        self.bound = bound
+
+
+class BackgroundPlanner:
+    """Chạy IncrementalPlanner ở một thread riêng để vòng lặp game không bị chặn.
+
+    Game gọi submit() với state hiện tại: problem được chụp lại (maze + DangerField)
+    rồi đưa cho thread; chỉ yêu cầu mới nhất được giữ. Kế hoạch xong được công bố
+    qua latest(); game không chờ mà tiếp tục bám theo kế hoạch hợp lệ gần nhất.
+    Lần tìm đang chạy bị huỷ khi layout đổi (maze xoay), khi submit(urgent=True) hoặc cancel().
+    Thread có cache MST riêng: không đụng tới cache của planner chạy trên thread game.
+    """
+
+    def __init__(self, problem, time_budget=None, node_budget=None, planner=None):
+        self.problem = problem
+        self.planner = planner or IncrementalPlanner(problem, time_budget, node_budget)
+        self._mst_caches = [MSTCache() for _ in range(4)]
+        self.cancelled = 0
+        self._cond = threading.Condition()
+        self._pending = None
+        self._running_version = None
+        self._cancel = threading.Event()
+        self._latest = None
+        self._seq = 0
+        self._stopped = False
+        self._thread = threading.Thread(target=self._run, name='pacman-planner', daemon=True)
+        self._thread.start()
+
+    def submit(self, start_state, urgent=False):
+        snapshot = self.problem.snapshot(self._mst_caches)
+        with self._cond:
+            self._seq += 1
+            self._pending = (self._seq, snapshot, start_state)
+            running = self._running_version
+            if running is not None and (urgent or running != snapshot.maze.layout_version):
+                self._cancel.set()
+            self._cond.notify()
+        return self._seq
+
+    def latest(self):
+        return self._latest
+
+    def cancel(self):
+        """Bỏ yêu cầu đang chờ và huỷ lần tìm đang chạy (vd. trước khi turbo lập kế hoạch trên thread game)."""
+        with self._cond:
+            self._pending = None
+            if self._running_version is not None:
+                self._cancel.set()
+
+    def stop(self):
+        with self._cond:
+            self._stopped = True
+            self._pending = None
+            self._cancel.set()
+            self._cond.notify()
+        self._thread.join(timeout=1.0)
+
+    def _run(self):
+        while True:
+            with self._cond:
+                while self._pending is None and not self._stopped:
+                    self._cond.wait()
+                if self._stopped:
+                    return
+                seq, snapshot, start_state = self._pending
+                self._pending = None
+                self._running_version = snapshot.maze.layout_version
+                self._cancel.clear()
+
+            self.planner.problem = snapshot
+            t0 = time.perf_counter()
+            try:
+                path, cost = self.planner.plan(start_state, self._cancel)
+            except SearchCancelled:
+                self.cancelled += 1
+                continue
+            finally:
+                with self._cond:
+                    self._running_version = None
+
+            result = PlanResult(seq, start_state, path, cost, self.planner.last_states(),
+                                self.planner.last_costs(), snapshot.maze.layout_version,
+                                self.planner.last_kind, self.planner.last_stats,
+                                time.perf_counter() - t0, self.planner.last_bound)
+            with self._cond:
+                self._latest = result
@@ -0,0 +1,134 @@
+import json
+import time
+from collections import deque
+from contextlib import contextmanager
+
+STAGES = ('plan', 'update', 'draw')
+
+
+class JsonlExporter:
+    """Ghi mỗi bản ghi thành một dòng JSON để phân tích offline."""
+
+    def __init__(self, path):
+        self.path = path
+        self._file = open(path, 'a', encoding='utf-8')
+
+    def write(self, record):
+        self._file.write(json.dumps(record, separators=(',', ':')) + '\n')
+
+    def flush(self):
+        self._file.flush()
+
+    def close(self):
+        if not self._file.closed:
+            self._file.close()
+
+
+class FrameProfiler:
+    """Đo thời gian plan / update / draw của từng frame và bộ đếm của mỗi lần tìm kiếm.
+
+    Giữ `window` frame gần nhất để vẽ HUD; nếu có export_path thì mọi frame
+    (kèm bộ đếm search nếu frame đó có lập kế hoạch) được ghi ra file JSONL.
+    """
+
+    def __init__(self, window=60, export_path=None):
+        self.frames = deque(maxlen=window)
+        self.frame_index = 0
+        self.last_search = None
+        self.exporter = JsonlExporter(export_path) if export_path else None
+        self._current = None
+        self._frame_start = None
+        self._last_frame_start = None
+
+    def begin_frame(self):
+        now = time.perf_counter()
+        self._last_frame_start, self._frame_start = self._frame_start, now
+        self._current = {name: 0.0 for name in STAGES}
+
+    @contextmanager
+    def stage(self, name):
+        t0 = time.perf_counter()
+        try:
+            yield
+        finally:
+            if self._current is not None:
+                self._current[name] = self._current.get(name, 0.0) + time.perf_counter() - t0
+
+    def record_search(self, kind, stats, bound=None):
+        """Bộ đếm của lần plan vừa xong (kind: 'reuse' | 'repair' | 'full' | 'anytime' | 'partial')."""
+        search = {'kind': kind, 'bound': bound}
+        search.update(stats.as_dict())
+        self.last_search = search
+        if self._current is not None:
+            self._current['search'] = search
+
+    def end_frame(self, **extra):
+        if self._current is None:
+            return None
+        now = time.perf_counter()
+        record = {'type': 'frame', 'frame': self.frame_index}
+        for name in STAGES:
+            record[name + '_ms'] = round(self._current[name] * 1000, 4)
+        record['busy_ms'] = round((now - self._frame_start) * 1000, 4)
+        if self._last_frame_start is not None:
+            # Khoảng cách giữa hai frame, gồm cả thời gian chờ clock.tick
+            record['interval_ms'] = round((self._frame_start - self._last_frame_start) * 1000, 4)
+        if 'search' in self._current:
+            record['search'] = self._current['search']
+        record.update(extra)
+
+        self.frames.append(record)
+        self.frame_index += 1
+        self._current = None
+        if self.exporter:
+            self.exporter.write(record)
+        return record
+
+    def write(self, record):
+        """Ghi một bản ghi tuỳ ý (vd. tổng kết một ván) ra JSONL nếu đang export."""
+        if self.exporter:
+            self.exporter.write(record)
+            self.exporter.flush()
+
+    def averages(self):
+        """Trung bình (ms) mỗi stage trên các frame trong cửa sổ."""
+        if not self.frames:
+            return {}
+        n = len(self.frames)
+        result = {name: sum(f[name + '_ms'] for f in self.frames) / n for name in STAGES}
+        result['busy'] = sum(f['busy_ms'] for f in self.frames) / n
+        intervals = [f['interval_ms'] for f in self.frames if 'interval_ms' in f]
+        if intervals:
+            result['interval'] = sum(intervals) / len(intervals)
+        return result
+
+    def hud_lines(self):
+        avg = self.averages()
+        if not avg:
+            return ["profiler: no frames yet"]
+        peak_plan = max(f['plan_ms'] for f in self.frames)
+        lines = [
+            f"plan   {avg['plan']:6.2f} ms  (max {peak_plan:.2f})",
+            f"update {avg['update']:6.2f} ms",
+            f"draw   {avg['draw']:6.2f} ms",
+            f"busy   {avg['busy']:6.2f} ms",
+        ]
+        if 'interval' in avg and avg['interval'] > 0:
+            lines.append(f"frame  {avg['interval']:6.2f} ms  ({1000 / avg['interval']:.0f} fps)")
+        search = self.last_search
+        if search:
+            lines.append(f"search {search['kind']}: exp {search['expanded']} push {search['pushes']} "
+                         f"h {search['heuristic_calls']}")
+            if search['bound'] is not None:
+                lines.append(f"bound  {search['bound']:.2f}")
+            lines.append(f"dist hit {_percent(search['distance_hit_rate'])}  "
+                         f"mst hit {_percent(search['mst_hit_rate'])}")
+        return lines
+
+    def close(self):
+        if self.exporter:
+            self.exporter.close()
+
+
+def _percent(rate):
+    return '-' if rate is None else f"{rate * 100:.1f}%"
@@ -0,0 +1,254 @@
+import argparse
+import hashlib
+import os
+import random
+import struct
+import sys
+
+os.environ.setdefault('PYGAME_HIDE_SUPPORT_PROMPT', '1')
+
+MAGIC = b'PMRC'
+VERSION = 1
+
+# Mã action trong file ghi; 0 = frame không ra quyết định
+ACTION_CODES = {'North': 1, 'South': 2, 'East': 3, 'West': 4, 'Stop': 5, 'Teleport': 6}
+ACTION_NAMES = {code: name for name, code in ACTION_CODES.items()}
+
+# Cờ của mỗi frame
+ROTATED = 1
+TELEPORTED = 2
+ATE = 4
+POWERED = 8
+
+# magic, version, có seed, seed, sha1 của file map, số ma, độ dài đường dẫn map
+_HEADER = struct.Struct('<4sBBq20sHH')
+
+
+def _frame_struct(ghost_count):
+    # action, cờ, hướng xoay, (x, y) Pacman, (x, y) từng con ma
+    return struct.Struct('<BBBhh' + 'hh' * ghost_count)
+
+
+def map_digest(map_path):
+    with open(map_path, 'rb') as f:
+        return hashlib.sha1(f.read()).digest()
+
+
+def new_seed():
+    return random.randrange(1 << 31)
+
+
+class GameRecorder:
+    """Ghi một ván ra file nhị phân: header (seed, map) rồi mỗi frame một bản ghi cố định.
+
+    Bản ghi có độ dài cố định nên Replay nhảy tới frame bất kỳ chỉ bằng một phép nhân.
+    Gọi record_frame(game, action) sau khi Pacman và ma đã update trong frame đó.
+    """
+
+    def __init__(self, path, game, seed):
+        self.path = path
+        self.seed = seed
+        self.frames = 0
+        self._frame = _frame_struct(len(game.ghosts))
+        self._file = open(path, 'wb')
+        map_path = game.map_path.encode('utf-8')
+        self._file.write(_HEADER.pack(MAGIC, VERSION, seed is not None, seed or 0,
+                                      map_digest(game.map_path), len(game.ghosts), len(map_path)))
+        self._file.write(map_path)
+        self._layout_version = game.maze.layout_version
+        self._eaten = game.maze.eaten
+        self._teleport_time = game.pacman.last_teleport_time
+
+    def record_frame(self, game, action=None):
+        maze, pacman = game.maze, game.pacman
+        flags = 0
+        if maze.layout_version != self._layout_version:
+            flags |= ROTATED
+            self._layout_version = maze.layout_version
+        if pacman.last_teleport_time != self._teleport_time:
+            flags |= TELEPORTED
+            self._teleport_time = pacman.last_teleport_time
+        if maze.eaten != self._eaten:
+            flags |= ATE
+            self._eaten = maze.eaten
+        if pacman.power_up_timer > 0:
+            flags |= POWERED
+
+        values = [ACTION_CODES.get(action, 0), flags, maze.orientation,
+                  int(pacman.grid_pos.x), int(pacman.grid_pos.y)]
+        for x, y in game.ghosts.cells():
+            values.append(x)
+            values.append(y)
+        self._file.write(self._frame.pack(*values))
+        self.frames += 1
+
+    def close(self):
+        if not self._file.closed:
+            self._file.close()
+
+
+class ReplayFrame:
+    __slots__ = ('index', 'action', 'flags', 'orientation', 'pacman', 'ghosts')
+
+    def __init__(self, index, values):
+        self.index = index
+        self.action = ACTION_NAMES.get(values[0])
+        self.flags = values[1]
+        self.orientation = values[2]
+        self.pacman = (values[3], values[4])
+        self.ghosts = [(values[i], values[i + 1]) for i in range(5, len(values), 2)]
+
+    @property
+    def rotated(self):
+        return bool(self.flags & ROTATED)
+
+    @property
+    def teleported(self):
+        return bool(self.flags & TELEPORTED)
+
+    @property
+    def ate(self):
+        return bool(self.flags & ATE)
+
+    @property
+    def powered(self):
+        return bool(self.flags & POWERED)
+
+    def as_dict(self):
+        return {'frame': self.index, 'action': self.action, 'orientation': self.orientation,
+                'pacman': self.pacman, 'ghosts': self.ghosts, 'rotated': self.rotated,
+                'teleported': self.teleported, 'ate': self.ate, 'powered': self.powered}
+
+
+class Replay:
+    """Đọc file của GameRecorder: truy cập ngẫu nhiên theo frame, không cần planner hay renderer.
+
+    replay[i] / seek(i) đọc thẳng bản ghi; simulate(i) chạy lại luật game (HeadlessGame,
+    cùng seed, action đã ghi) tới frame i để có đủ trạng thái maze; verify() so từng
+    frame mô phỏng với bản ghi để phát hiện thay đổi hành vi.
+    """
+
+    def __init__(self, path):
+        self.path = path
+        with open(path, 'rb') as f:
+            data = f.read()
+        magic, version, has_seed, seed, digest, ghost_count, path_len = _HEADER.unpack_from(data)
+        if magic != MAGIC:
+            raise ValueError(f"{path} is not a game recording")
+        if version != VERSION:
+            raise ValueError(f"unsupported recording version {version}")
+        offset = _HEADER.size
+        self.map_path = data[offset:offset + path_len].decode('utf-8')
+        self.map_digest = digest
+        self.seed = seed if has_seed else None
+        self.ghost_count = ghost_count
+        self._frame = _frame_struct(ghost_count)
+        self._data = data
+        self._offset = offset + path_len
+        self.frame_count = (len(data) - self._offset) // self._frame.size
+
+    def __len__(self):
+        return self.frame_count
+
+    def __getitem__(self, index):
+        if index < 0:
+            index += self.frame_count
+        if not 0 <= index < self.frame_count:
+            raise IndexError("frame out of range")
+        values = self._frame.unpack_from(self._data, self._offset + index * self._frame.size)
+        return ReplayFrame(index, values)
+
+    def seek(self, index):
+        return self[index]
+
+    def frames(self, start=0, stop=None, step=1):
+        """Tua nhanh: duyệt các frame [start, stop) với bước step."""
+        stop = self.frame_count if stop is None else min(stop, self.frame_count)
+        for index in range(start, stop, step):
+            yield self[index]
+
+    def actions(self):
+        """[(frame, action)] các frame có ra quyết định."""
+        return [(f.index, f.action) for f in self.frames() if f.action]
+
+    def events(self):
+        """Các frame có xoay maze, teleport hoặc ăn food."""
+        return [f for f in self.frames() if f.flags & (ROTATED | TELEPORTED | ATE)]
+
+    def check_map(self):
+        if not os.path.exists(self.map_path):
+            raise FileNotFoundError(self.map_path)
+        if map_digest(self.map_path) != self.map_digest:
+            raise ValueError(f"{self.map_path} changed since the game was recorded")
+
+    def _start_game(self):
+        from headless import HeadlessGame
+        self.check_map()
+        game = HeadlessGame(self.map_path, seed=self.seed)
+        if self.seed is not None:
+            random.seed(self.seed)
+        game.reset_pacman()
+        return game
+
+    def simulate(self, until=None, on_frame=None):
+        """Chạy lại ván tới hết frame until (mặc định: tới cuối), trả về HeadlessGame lúc đó."""
+        from main import apply_action
+        game = self._start_game()
+        until = self.frame_count if until is None else min(until + 1, self.frame_count)
+        for index in range(until):
+            frame = self[index]
+            if frame.action:
+                apply_action(game.pacman, frame.action)
+            game.pacman.update()
+            game.ghosts.update()
+            if on_frame:
+                on_frame(game, frame)
+        return game
+
+    def verify(self):
+        """Frame đầu tiên mà mô phỏng lệch khỏi bản ghi, None nếu khớp hoàn toàn."""
+        mismatch = []
+
+        def check(game, frame):
+            if mismatch:
+                return
+            pacman = (int(game.pacman.grid_pos.x), int(game.pacman.grid_pos.y))
+            ghosts = game.ghosts.cells()
+            if pacman != frame.pacman or ghosts != frame.ghosts or game.maze.orientation != frame.orientation:
+                mismatch.append(frame.index)
+
+        self.simulate(on_frame=check)
+        return mismatch[0] if mismatch else None
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Xem / tua / kiểm tra lại một ván đã ghi.")
+    parser.add_argument('recording', help="file ghi (.pmr)")
+    parser.add_argument('--seek', type=int, default=None, help="in trạng thái tại frame này")
+    parser.add_argument('--events', action='store_true', help="liệt kê các frame xoay / teleport / ăn food")
+    parser.add_argument('--verify', action='store_true', help="chạy lại luật game và so với bản ghi")
+    args = parser.parse_args(argv)
+
+    replay = Replay(args.recording)
+    print(f"{args.recording}: map={replay.map_path} seed={replay.seed} "
+          f"frames={len(replay)} ghosts={replay.ghost_count}")
+
+    if args.seek is not None:
+        print(replay.seek(args.seek).as_dict())
+    if args.events:
+        for frame in replay.events():
+            kinds = [name for name, flag in (('rotate', ROTATED), ('teleport', TELEPORTED), ('eat', ATE))
+                     if frame.flags & flag]
+            print(f"{frame.index:6d} {'+'.join(kinds):16s} pacman={frame.pacman}")
+    if args.verify:
+        index = replay.verify()
+        if index is None:
+            print("verify: OK")
+        else:
+            print(f"verify: diverged at frame {index}")
+            return 1
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,482 @@
+from settings import ROUTE_PLANNER_MIN_FOOD
+from collections import deque
+
+from search import SearchStats, _path_to_exit
+from planner import IncrementalPlanner
+
+# Số food tối đa giải đúng bằng Held-Karp (2^n * n^2 phép tính): 9 điểm ~4 ms, 12 điểm ~50 ms
+HELD_KARP_LIMIT = 9
+UNREACHABLE = 9999
+
+_MOVES = [(-1, 0, 'West'), (1, 0, 'East'), (0, -1, 'North'), (0, 1, 'South')]
+_DELTAS = {action: (dx, dy) for dx, dy, action in _MOVES}
+
+
+# ==============================
+#  Thứ tự ăn food (TSP đường đi)
+# ==============================
+def held_karp(n, start_cost, cost, end_cost=None):
+    """Thứ tự tối ưu đi qua n điểm: bắt đầu từ start, kết thúc ở end (nếu có).
+
+    start_cost[j]: start -> j; cost[i][j]: i -> j; end_cost[j]: j -> end hoặc None (kết thúc tự do).
+    Trả về (order, tổng chi phí).
+    """
+    if n == 0:
+        return [], 0
+    full = (1 << n) - 1
+    # best[mask][j]: chi phí nhỏ nhất đi hết mask, dừng ở j (j thuộc mask)
+    best = [[None] * n for _ in range(1 << n)]
+    parent = [[-1] * n for _ in range(1 << n)]
+    for j in range(n):
+        best[1 << j][j] = start_cost[j]
+
+    for mask in range(1, full + 1):
+        row = best[mask]
+        for j in range(n):
+            value = row[j]
+            if value is None:
+                continue
+            cost_j = cost[j]
+            for k in range(n):
+                bit = 1 << k
+                if mask & bit:
+                    continue
+                candidate = value + cost_j[k]
+                slot = best[mask | bit]
+                if slot[k] is None or candidate < slot[k]:
+                    slot[k] = candidate
+                    parent[mask | bit][k] = j
+
+    last, total = None, None
+    for j in range(n):
+        value = best[full][j] + (end_cost[j] if end_cost is not None else 0)
+        if total is None or value < total:
+            last, total = j, value
+
+    order = []
+    mask = full
+    while last != -1:
+        order.append(last)
+        last, mask = parent[mask][last], mask & ~(1 << last)
+    order.reverse()
+    return order, total
+
+
+def nearest_neighbour(n, start_cost, cost):
+    remaining = set(range(n))
+    order = []
+    current = None
+    while remaining:
+        row = start_cost if current is None else cost[current]
+        current = min(remaining, key=lambda j: (row[j], j))
+        remaining.remove(current)
+        order.append(current)
+    return order
+
+
+def route_cost(order, start_cost, cost, end_cost=None):
+    if not order:
+        return 0
+    total = start_cost[order[0]]
+    for a, b in zip(order, order[1:]):
+        total += cost[a][b]
+    if end_cost is not None:
+        total += end_cost[order[-1]]
+    return total
+
+
+def two_opt(order, start_cost, cost, end_cost=None):
+    """Đảo đoạn order[i..k] khi làm đường ngắn lại, lặp tới khi không cải thiện được nữa.
+
+    Khoảng cách có thể không đối xứng (teleport): đảo đoạn thì các cạnh bên trong cũng đổi chiều.
+    """
+    n = len(order)
+    # forward[t] / backward[t]: tổng các cạnh giữa order[0..t] theo chiều đi / chiều ngược
+    forward = [0] * n
+    backward = [0] * n
+
+    def prefix(start):
+        for t in range(max(start, 1), n):
+            a, b = order[t - 1], order[t]
+            forward[t] = forward[t - 1] + cost[a][b]
+            backward[t] = backward[t - 1] + cost[b][a]
+
+    def before(i):
+        return start_cost[order[i]] if i == 0 else cost[order[i - 1]][order[i]]
+
+    def reversed_before(i, k):
+        return start_cost[order[k]] if i == 0 else cost[order[i - 1]][order[k]]
+
+    prefix(0)
+    improved = True
+    while improved:
+        improved = False
+        for i in range(n - 1):
+            for k in range(i + 1, n):
+                if k + 1 < n:
+                    after_old = cost[order[k]][order[k + 1]]
+                    after_new = cost[order[i]][order[k + 1]]
+                elif end_cost is not None:
+                    after_old = end_cost[order[k]]
+                    after_new = end_cost[order[i]]
+                else:
+                    after_old = after_new = 0
+                inner = (backward[k] - backward[i]) - (forward[k] - forward[i])
+                delta = reversed_before(i, k) + after_new - before(i) - after_old + inner
+                if delta < 0:
+                    order[i:k + 1] = order[i:k + 1][::-1]
+                    prefix(i)
+                    improved = True
+    return order
+
+
+def or_opt(order, start_cost, cost, end_cost=None, max_segment=3):
+    """Chuyển một đoạn 1..max_segment điểm (giữ hoặc đảo chiều) sang chỗ khác nếu rẻ hơn."""
+
+    def link(a, b):
+        # a = None: điểm xuất phát; b = None: điểm kết thúc (0 nếu kết thúc tự do)
+        if a is None:
+            return start_cost[b]
+        if b is None:
+            return end_cost[a] if end_cost is not None else 0
+        return cost[a][b]
+
+    def inner(piece):
+        return sum(cost[a][b] for a, b in zip(piece, piece[1:]))
+
+    order = list(order)
+    improved = True
+    while improved:
+        improved = False
+        n = len(order)
+        for length in range(1, min(max_segment, n - 1) + 1):
+            i = 0
+            while i + length <= n:
+                segment = order[i:i + length]
+                prev = order[i - 1] if i > 0 else None
+                nxt = order[i + length] if i + length < n else None
+                # Bỏ đoạn ra khỏi chỗ cũ tiết kiệm được gain
+                gain = link(prev, segment[0]) + link(segment[-1], nxt) - link(prev, nxt)
+                rest = order[:i] + order[i + length:]
+                # Đảo chiều đoạn: các cạnh bên trong đổi chiều (khoảng cách không đối xứng)
+                flip = inner(segment[::-1]) - inner(segment)
+                best = None
+                for j in range(len(rest) + 1):
+                    if j == i:
+                        continue
+                    a = rest[j - 1] if j > 0 else None
+                    b = rest[j] if j < len(rest) else None
+                    base = link(a, b)
+                    for piece, extra in ((segment, 0), (segment[::-1], flip)):
+                        delta = link(a, piece[0]) + link(piece[-1], b) - base - gain + extra
+                        if delta < 0 and (best is None or delta < best[0]):
+                            best = (delta, j, piece)
+                if best is not None:
+                    _, j, piece = best
+                    order = rest[:j] + piece + rest[j:]
+                    improved = True
+                i += 1
+    return order
+
+
+def solve_order(start, points, distance, end=None, initial=None):
+    """Thứ tự đi qua points từ start (rồi tới end nếu có) theo khoảng cách distance(a, b).
+
+    <= HELD_KARP_LIMIT điểm: Held-Karp (chính xác); nhiều hơn: láng giềng gần nhất + 2-opt + Or-opt.
+    initial: thứ tự cũ (cùng tập points) để cải thiện tiếp thay vì giải lại từ đầu; được giữ
+    nguyên nếu không tệ hơn, tránh lộ trình nhảy qua lại giữa các lời giải ngang nhau.
+    Trả về (danh sách điểm theo thứ tự, tổng chi phí, exact).
+    """
+    n = len(points)
+    if initial is not None:
+        # Đưa points về đúng thứ tự initial để chỉ số khớp nhau
+        points = list(initial)
+
+    def dist(a, b):
+        d = distance(a, b)
+        return UNREACHABLE if d is None else d
+
+    start_cost = [dist(start, p) for p in points]
+    cost = [[dist(a, b) for b in points] for a in points]
+    end_cost = [dist(p, end) for p in points] if end is not None else None
+
+    if n <= HELD_KARP_LIMIT:
+        order, total = held_karp(n, start_cost, cost, end_cost)
+        if initial is not None and route_cost(list(range(n)), start_cost, cost, end_cost) <= total:
+            return points, total, True
+        return [points[i] for i in order], total, True
+
+    if initial is not None:
+        order = list(range(n))
+    else:
+        order = nearest_neighbour(n, start_cost, cost)
+    order = two_opt(order, start_cost, cost, end_cost)
+    order = or_opt(order, start_cost, cost, end_cost)
+    order = two_opt(order, start_cost, cost, end_cost)
+    return [points[i] for i in order], route_cost(order, start_cost, cost, end_cost), False
+
+
+# ==============================
+#  Planner theo lộ trình
+# ==============================
+class RoutePlanner:
+    """Lập kế hoạch hai tầng khi còn nhiều food: thứ tự food (solve_order) + đường đi từng chặng.
+
+    Ít hơn min_food food thì chuyển cho exact (IncrementalPlanner, A* trên cả tập food);
+    exact hết ngân sách trước lời giải đầy đủ thì đi đoạn dở của nó một lần, sau đó đi
+    theo lộ trình cho tới khi tập food đổi. Chặng đầu hết ngân sách thì thay bằng BFS né ma.
+    Chặng đầu tìm bằng A* một đích (có tính DangerField, dùng lại / sửa qua các frame
+    như IncrementalPlanner, cùng ngân sách với exact); các chặng sau đi theo bảng khoảng cách BFS. Thứ tự chỉ được
+    giải lại khi Pacman ăn food ngoài thứ tự.
+    Cùng giao diện với IncrementalPlanner để dùng được trong BackgroundPlanner.
+    """
+
+    def __init__(self, problem, exact, min_food=ROUTE_PLANNER_MIN_FOOD):
+        self.exact = exact
+        self.leg_planner = IncrementalPlanner(problem, exact.time_budget, exact.node_budget, to_exit=False)
+        self.min_food = min_food
+        self.route_plans = 0
+        self.route_solves = 0
+        self.order = []
+        self.order_exact = False
+        self._order_key = None
+        # Thứ tự theo toạ độ map gốc: giữ được qua các lần xoay maze
+        self._base_order = []
+        self._mode = 'exact'
+        # Bitmask food mà exact đã hết ngân sách: còn đúng tập food đó thì đi theo lộ trình
+        self._exact_exhausted = None
+        self._route_kind = None
+        self._route_stats = SearchStats()
+        self._route_states = []
+        self._route_costs = []
+        # Chặng (a, b) -> [(ô, action)] theo bảng khoảng cách, giữ tới khi maze xoay
+        self._legs = {}
+        self._legs_version = None
+        self.problem = problem
+
+    @property
+    def problem(self):
+        return self.exact.problem
+
+    @problem.setter
+    def problem(self, problem):
+        self.exact.problem = problem
+        self.leg_planner.problem = problem
+
+    @property
+    def full_replans(self):
+        return self.exact.full_replans + self.leg_planner.full_replans
+
+    @property
+    def repairs(self):
+        return self.exact.repairs + self.leg_planner.repairs
+
+    @property
+    def reuses(self):
+        return self.exact.reuses + self.leg_planner.reuses
+
+    @property
+    def last_kind(self):
+        return self.exact.last_kind if self._mode == 'exact' else self._route_kind
+
+    @property
+    def last_stats(self):
+        return self.exact.last_stats if self._mode == 'exact' else self._route_stats
+
+    @property
+    def last_bound(self):
+        return self.exact.last_bound if self._mode == 'exact' else None
+
+    def last_states(self):
+        return self.exact.last_states() if self._mode == 'exact' else self._route_states
+
+    def last_costs(self):
+        return self.exact.last_costs() if self._mode == 'exact' else self._route_costs
+
+    def plan(self, start_state, cancel=None):
+        problem = self.problem
+        foods = problem.food_cells(start_state)
+        if len(foods) < self.min_food and start_state[1] != self._exact_exhausted:
+            self._mode = 'exact'
+            result = self.exact.plan(start_state, cancel)
+            if self.exact.last_kind == 'partial':
+                self._exact_exhausted = start_state[1]
+            return result
+
+        self._mode = 'route'
+        self.route_plans += 1
+        problem.update_danger_field()
+        pos = start_state[0]
+        order = self._solve(pos, foods)
+        # Chặng đầu: A* tới food đầu tiên trong thứ tự, tránh ma như planner chính
+        first = order[0]
+        leg_path, cost = self.leg_planner.plan((pos, problem.food_index.bits[first]), cancel)
+        kind = self.leg_planner.last_kind
+        self._route_kind = f"route-{kind}" if kind else 'route'
+        self._route_stats = self.leg_planner.last_stats
+        if not leg_path:
+            self._route_states = []
+            self._route_costs = []
+            return [], 0
+        leg_states = self.leg_planner.last_states()
+        oracle = problem.get_distance_oracle()
+        if self._legs_version != problem.maze.layout_version:
+            self._legs = {}
+            self._legs_version = problem.maze.layout_version
+        if kind == 'partial':
+            # Hết ngân sách trước khi tới food đầu: chặng đầu tìm bằng BFS né ô sát ma (rẻ),
+            # rồi bảng khoảng cách; đoạn dở của A* chỉ dùng khi cả hai không có đường
+            leg = self._safe_leg(problem, pos, first)
+            if leg is None:
+                leg = self._descend(problem, oracle, pos, first)
+            if leg is None:
+                self._route_states = self._with_masks(problem, start_state, [s[0] for s in leg_states])
+                self._route_costs = self.leg_planner.last_costs()
+                return leg_path, cost
+            positions = [step_pos for step_pos, _ in leg]
+            actions = [action for _, action in leg]
+            costs = [1] * len(leg)
+            cost = len(leg)
+            current = first
+        else:
+            actions = leg_path[:-1]
+            costs = self.leg_planner.last_costs()[:-1]
+            positions = [state[0] for state in leg_states[:-1]]
+            current = leg_states[-1][0]
+
+        # Các chặng sau: đi theo bảng khoảng cách tới từng food
+        finished = True
+        for target in order[1:]:
+            leg = self._legs.get((current, target))
+            if leg is None:
+                leg = self._descend(problem, oracle, current, target)
+                self._legs[(current, target)] = leg
+            if leg is None:
+                finished = False
+                break
+            for step_pos, action in leg:
+                positions.append(step_pos)
+                actions.append(action)
+                costs.append(1)
+            cost += len(leg)
+            current = target
+
+        exit_pos = problem.exit_pos
+        if finished and exit_pos:
+            x, y = current
+            exit_path = _path_to_exit(problem, current, exit_pos)
+            for action in exit_path:
+                positions.append((x, y))
+                actions.append(action)
+                costs.append(1)
+                dx, dy = _DELTAS[action]
+                x, y = x + dx, y + dy
+            cost += len(exit_path)
+            current = (x, y)
+        positions.append(current)
+        actions.append('Stop')
+        costs.append(0)
+
+        self._route_states = self._with_masks(problem, start_state, positions)
+        self._route_costs = costs
+        return actions, cost
+
+    def _solve(self, pos, foods):
+        problem = self.problem
+        maze = problem.maze
+        key = (frozenset(foods), maze.layout_version)
+        if key == self._order_key:
+            return self.order
+
+        base_foods = {maze.to_base(*food) for food in foods}
+        oracle = problem.get_distance_oracle()
+        initial = None
+        if self._base_order and base_foods <= set(self._base_order):
+            remaining = [b for b in self._base_order if b in base_foods]
+            if remaining == self._base_order[len(self._base_order) - len(remaining):]:
+                # Ăn đúng các food đầu lộ trình (hoặc maze vừa xoay): giữ phần còn lại
+                self.order = [maze.from_base(*b) for b in remaining]
+                self._base_order = remaining
+                self._order_key = key
+                return self.order
+            # Ăn food ngoài thứ tự: sửa tiếp lộ trình cũ thay vì giải lại từ đầu
+            initial = [maze.from_base(*b) for b in remaining]
+        self.order, _, self.order_exact = solve_order(pos, foods, oracle.distance, problem.exit_pos, initial)
+        self._base_order = [maze.to_base(*food) for food in self.order]
+        self._order_key = key
+        self.route_solves += 1
+        return self.order
+
+    def _safe_leg(self, problem, start, target):
+        """BFS start -> target không đi qua góc teleport và ô sát ma (phạt DangerField >= 1500).
+
+        Trả về [(ô, action)] như _descend, None nếu không có đường.
+        """
+        maze = problem.maze
+        width = maze.tile_width
+        penalty = problem.danger.penalty
+        corners = problem._corner_cells()
+        parents = {start: None}
+        queue = deque([start])
+        while queue:
+            current = queue.popleft()
+            if current == target:
+                leg = []
+                while parents[current] is not None:
+                    current, action = parents[current]
+                    leg.append((current, action))
+                leg.reverse()
+                return leg
+            x, y = current
+            for dx, dy, action in _MOVES:
+                nxt = ((x + dx) % width, y + dy)
+                if nxt in parents or maze.is_wall(*nxt):
+                    continue
+                if nxt != target and (nxt in corners or penalty.get(nxt, 0) >= 1500):
+                    continue
+                parents[nxt] = (current, action)
+                queue.append(nxt)
+        return None
+
+    def _descend(self, problem, oracle, start, target):
+        """Đường ngắn nhất start -> target theo hàng khoảng cách của target trong oracle."""
+        dist = oracle.distances_from(target)
+        width = problem.maze.tile_width
+        corners = problem._corner_cells()
+        x, y = start
+        here = dist(x, y)
+        if here is None:
+            return None
+        leg = []
+        while (x, y) != target:
+            for dx, dy, action in _MOVES:
+                nx, ny = (x + dx) % width, y + dy
+                if (nx, ny) in corners and (nx, ny) != target:
+                    # Bước vào góc là bị teleport: lạc quan chọn góc đích gần target nhất
+                    landings = [c for c in corners if c != (nx, ny) and dist(*c) == here - 1]
+                    if landings:
+                        nx, ny = landings[0]
+                        break
+                elif dist(nx, ny) == here - 1:
+                    break
+            else:
+                return None
+            leg.append(((x, y), action))
+            here -= 1
+            x, y = nx, ny
+        return leg
+
+    def _with_masks(self, problem, start_state, positions):
+        """State (ô, food còn lại) trước mỗi action: food trên đường đi bị ăn dần."""
+        bits = problem.food_index.bits
+        mask = start_state[1]
+        states = []
+        for pos in positions:
+            mask &= ~bits.get(pos, 0)
+            states.append((pos, mask))
+        return states
+
+
+def make_planner(problem, time_budget=None, node_budget=None, min_food=ROUTE_PLANNER_MIN_FOOD):
+    """Planner dùng trong game: lộ trình khi nhiều food, IncrementalPlanner khi ít."""
+    return RoutePlanner(problem, IncrementalPlanner(problem, time_budget, node_budget), min_food)
@@ -1,66 +1,197 @@
+import copy
 import heapq
-import pygame
+import time
+from collections import OrderedDict, deque
+from array import array
+from distance import DistanceOracle, OracleView
+from maze import WALL, FOOD, EXIT
+
+class FoodIndex:
+    """Gán cho mỗi ô food một bit cố định; tập food còn lại là một số nguyên (bitmask)."""
+
+    def __init__(self, cells=()):
+        self.cells = []
+        self.bits = {}
+        for cell in cells:
+            self.add(cell)
+
+    def add(self, cell):
+        bit = self.bits.get(cell)
+        if bit is None:
+            bit = 1 << len(self.cells)
+            self.bits[cell] = bit
+            self.cells.append(cell)
+        return bit
+
+    def encode(self, cells):
+        mask = 0
+        for cell in cells:
+            mask |= self.add(cell)
+        return mask
+
+    def decode(self, mask):
+        cells = []
+        # Chỉ duyệt các bit bật (bit thấp nhất trước), không quét từng bit 0
+        while mask:
+            low = mask & -mask
+            cells.append(self.cells[low.bit_length() - 1])
+            mask ^= low
+        return cells
+
+
+class DangerField:
+    """Chi phí bước và phạt heuristic theo vị trí ma, tra O(1) theo ô.
+
+    step_cost[y * width + x]: 9999 ở ô có ma, 30 ở ô kề ma, 20 trên hàng có ma, còn lại 1.
+    penalty[(x, y)]: tổng phạt 1500 (cách ma <= 1) / 500 (cách ma <= 3) dùng trong heuristic.
+    """
+
+    def __init__(self, maze, ghost_cells, powered_up=False):
+        self.width = maze.tile_width
+        self.height = maze.tile_height
+        self.powered_up = powered_up
+        self.ghost_cells = set(ghost_cells)
+        self.step_cost = array('H', [1]) * (self.width * self.height)
+        self.penalty = {}
+
+        for gx, gy in self.ghost_cells:
+            if 0 <= gy < self.height:
+                start = gy * self.width
+                for i in range(start, start + self.width):
+                    self.step_cost[i] = 20
+        for gx, gy in self.ghost_cells:
+            for dx, dy in [(-1,0),(1,0),(0,-1),(0,1)]:
+                nx, ny = gx + dx, gy + dy
+                if not maze.is_wall(nx, ny):
+                    self.step_cost[ny * self.width + nx] = 30
+        for gx, gy in self.ghost_cells:
+            if 0 <= gx < self.width and 0 <= gy < self.height:
+                self.step_cost[gy * self.width + gx] = 9999
+
+        for gx, gy in ghost_cells:
+            for dy in range(-3, 4):
+                for dx in range(-3 + abs(dy), 4 - abs(dy)):
+                    cell = (gx + dx, gy + dy)
+                    self.penalty[cell] = self.penalty.get(cell, 0) + (1500 if abs(dx) + abs(dy) <= 1 else 500)
+
 
 class PacmanSearchProblem:
     def __init__(self, game_maze):
         self.maze = game_maze
+        # Dữ liệu dẫn xuất từ map được dựng sẵn cho cả 4 hướng xoay (maze.orientation)
+        self._exit_positions = []
+        self._food_indexes = []
+        self._mst_caches = []
+        self._oracles = []
+        # Map đã biên dịch: exit, food và bảng khoảng cách có sẵn, oracle dùng chung giữa các ván.
+        # Food trong file là food lúc bắt đầu ván, chỉ dùng khi maze chưa bị ăn gì.
+        compiled = getattr(self.maze, "compiled", None)
+        # Các hướng có cùng đồ thị dùng chung bảng khoảng cách của hướng nhỏ nhất (OracleView)
+        owners = [self.maze.oracle_owner(k) for k in range(4)]
+        for k in range(4):
+            if compiled is not None:
+                self._exit_positions.append(compiled.exit(k))
+                food = compiled.food(k) if self.maze.eaten == 0 else self.maze.find_all(FOOD, k)
+                self._food_indexes.append(FoodIndex(food))
+                self._mst_caches.append(MSTCache())
+            else:
+                exits = self.maze.find_all(EXIT, k)
+                self._exit_positions.append(exits[0] if exits else None)
+                self._food_indexes.append(FoodIndex(self.maze.find_all(FOOD, k)))
+                self._mst_caches.append(MSTCache())
+            owner = owners[k]
+            if owner != k:
+                width, height = self.maze.orientation_size(k)
+                oracle = OracleView(self._oracles[owner], self.maze.orientation_map(k, owner),
+                                    self.maze.orientation_map(owner, k), width, height)
+            elif compiled is not None:
+                oracle = compiled.oracle(k)
+            else:
+                oracle = self._build_oracle(k)
+            self._oracles.append(oracle)
         self.start_state = self._get_start_state() 
-        self.exit_pos = self._find_char_in_maze('E')
-        self._distance_cache = {}
-
-    def get_start_state(self):
-        return self.start_state
-
-    def is_goal_state(self, state):
-        pacman_pos, food_set = state
-        return len(food_set) == 0
-
-    def get_successors(self, state):
-        successors = []
-        pacman_pos_tuple, food_set = state
-        pacman_pos = pygame.Vector2(pacman_pos_tuple)
-
+        self.danger = None
+        self._danger_key = None
+        self._frozen = False
+
+    def snapshot(self, mst_caches=None):
+        """Bản sao đóng băng maze (hướng xoay) và DangerField hiện tại, để tìm ở thread khác.
+
+        Bảng khoảng cách và FoodIndex vẫn dùng chung với problem gốc (chỉ thêm hàng / đọc).
+        mst_caches: 4 MSTCache riêng của thread tìm kiếm; LRU không an toàn khi hai thread
+        cùng sửa, nên snapshot không dùng chung cache MST với problem gốc.
+        """
+        danger = self.update_danger_field()
+        frozen = copy.copy(self)
+        frozen.maze = self.maze.snapshot()
+        frozen.danger = danger
+        frozen._mst_caches = mst_caches if mst_caches is not None else [MSTCache() for _ in range(4)]
+        frozen._frozen = True
+        return frozen
+
+    def update_danger_field(self):
+        """Dựng lại DangerField từ vị trí ma hiện tại; gọi một lần trước mỗi lần lập kế hoạch."""
+        if self._frozen:
+            return self.danger
         is_powered_up = False
+        ghost_cells = []
         try:
             if self.maze.game.pacman.power_up_timer > 0:
                 is_powered_up = True
         except Exception:
-            pass 
-
-        ghost_positions = set()
-        danger_zones = set()
-        dangerous_rows = set()
+            pass
         try:
             if hasattr(self.maze, "game") and hasattr(self.maze.game, "ghosts"):
-                for ghost in self.maze.game.ghosts:
-                    gx = int(round(ghost.grid_pos.x))
-                    gy = int(round(ghost.grid_pos.y))
-                    ghost_positions.add((gx, gy))
-                    dangerous_rows.add(gy)
-                    for dx, dy in [(-1,0),(1,0),(0,-1),(0,1)]:
-                        nx, ny = gx + dx, gy + dy
-                        if 0 <= ny < len(self.maze.map_data) and 0 <= nx < len(self.maze.map_data[ny]):
-                            if self.maze.map_data[ny][nx] != '%':
-                                danger_zones.add((nx, ny))
+                ghost_cells = self.maze.game.ghosts.cells()
         except Exception:
             pass
 
-        corners = [
-                (0, 0), (self.maze.tile_width - 1, 0),
-                (0, self.maze.tile_height - 1), (self.maze.tile_width - 1, self.maze.tile_height - 1)
-        ]
-        if pacman_pos_tuple in corners:
-            for target in corners:
-                if target == pacman_pos_tuple: continue
-                if target in ghost_positions: continue
-                cost = 1
-                if target in danger_zones or target[1] in dangerous_rows:
-                    cost += 50
-                successors.append(((target, food_set), 'Teleport', cost))
+        key = (tuple(ghost_cells), is_powered_up, getattr(self.maze, "layout_version", 0))
+        if self.danger is None or self._danger_key != key:
+            self.danger = DangerField(self.maze, ghost_cells, is_powered_up)
+            self._danger_key = key
+        return self.danger
+
+    def get_start_state(self):
+        return self.start_state
+
+    @property
+    def exit_pos(self):
+        return self._exit_positions[self.maze.orientation]
+
+    @property
+    def food_index(self):
+        return self._food_indexes[self.maze.orientation]
+
+    @property
+    def mst_cache(self):
+        return self._mst_caches[self.maze.orientation]
+
+    def make_state(self, pacman_pos, food_cells):
+        return (pacman_pos, self.food_index.encode(food_cells))
+
+    def food_cells(self, state):
+        """Toạ độ các food còn lại của state (giải mã bitmask)."""
+        return self.food_index.decode(state[1])
+
+    def is_goal_state(self, state):
+        return state[1] == 0
+
+    def get_successors(self, state):
+        successors = []
+        pacman_pos_tuple, food_mask = state
+        food_bits = self.food_index.bits
+
+        danger = self.danger if self.danger is not None else self.update_danger_field()
+        is_powered_up = danger.powered_up
+        step_cost = danger.step_cost
+        width = danger.width
+
+        corners = self._corner_cells()
 
         # Di chuyển 4 hướng
         actions = [(-1,0,'West'), (1,0,'East'), (0,-1,'North'), (0,1,'South')]
-        x, y = int(pacman_pos.x), int(pacman_pos.y)
+        x, y = int(pacman_pos_tuple[0]), int(pacman_pos_tuple[1])
 
         for dx, dy, action in actions:
             nx, ny = x + dx, y + dy
@@ -68,125 +199,165 @@ class PacmanSearchProblem:
             if nx < 0: nx = self.maze.tile_width - 1
             elif nx >= self.maze.tile_width: nx = 0
 
-            if not (0 <= ny < len(self.maze.map_data)):
+            tile = self.maze.cell(nx, ny)
+            if tile is None:
                 continue
                 
-            is_wall = self.maze.map_data[ny][nx] == '%'
+            is_wall = tile == WALL
             
             if is_wall and not is_powered_up:
                 continue 
 
             next_pos = (nx, ny)
-            cost = 1
-            if next_pos in ghost_positions: cost = 9999
-            elif next_pos in danger_zones: cost = 30
-            elif ny in dangerous_rows: cost = 20
+            cost = step_cost[ny * width + nx]
             
-            next_food_set = set(food_set)
-            if next_pos in next_food_set:
-                next_food_set.remove(next_pos)
+            next_food_mask = food_mask
+            bit = food_bits.get(next_pos, 0)
+            if food_mask & bit:
+                next_food_mask = food_mask & ~bit
                 cost = max(1, cost - 50)
 
-            successors.append(((next_pos, frozenset(next_food_set)), action, cost))
+            if next_pos in corners:
+                # Bước vào góc là bị teleport ngay sang một góc khác (ngẫu nhiên trong game).
+                # Lập kế hoạch lạc quan với từng góc đích; nếu rơi vào góc khác thì sẽ lập lại.
+                for target in corners:
+                    if target == next_pos: continue
+                    teleport_cost = cost
+                    # Góc có ma: đắt như bước vào ô có ma, nhưng không cắt mất đường duy nhất
+                    if target in danger.ghost_cells:
+                        teleport_cost += 9999
+                    elif step_cost[target[1] * width + target[0]] > 1:
+                        teleport_cost += 50
+                    successors.append(((target, next_food_mask), action, teleport_cost))
+                continue
+
+            successors.append(((next_pos, next_food_mask), action, cost))
 
         return successors
         
-    # === BFS cache ===
-    def get_maze_distance(self, start, goal):
-        if start == goal:
-            return 0
-
-        if (start, goal) in self._distance_cache:
-            return self._distance_cache[(start, goal)]
-
-        def is_walkable(x, y):
-            return (
-                0 <= y < len(self.maze.map_data)
-                and 0 <= x < len(self.maze.map_data[y])
-                and self.maze.map_data[y][x] != '%'
-            )
+    # === Bảng khoảng cách ===
+    def _corner_cells(self, orientation=None):
+        if orientation is None:
+            return self.maze.teleport_corners
+        return self.maze.orientation_corners(orientation)
+
+    def _build_oracle(self, orientation):
+        corners = self._corner_cells(orientation)
+        sources = list(self._food_indexes[orientation].cells)
+        if self._exit_positions[orientation]:
+            sources.append(self._exit_positions[orientation])
+        sources.extend(corners)
+        width, height = self.maze.orientation_size(orientation)
+        return DistanceOracle(self.maze.orientation_cells(orientation), width, height,
+                              sources, corners)
+
+    def get_distance_oracle(self):
+        return self._oracles[self.maze.orientation]
 
-        def jump(x, y, dx, dy):
-
-            next_x, next_y = x + dx, y + dy
-            if not is_walkable(next_x, next_y):
-                return None
-            if (next_x, next_y) == goal:
-                return (next_x, next_y)
-
-            if dx != 0 and dy == 0:  # ngang
-                if (is_walkable(next_x, next_y - 1) and not is_walkable(x, y - 1)) \
-                   or (is_walkable(next_x, next_y + 1) and not is_walkable(x, y + 1)):
-                    return (next_x, next_y)
-            elif dy != 0 and dx == 0:  # dọc
-                if (is_walkable(next_x - 1, next_y) and not is_walkable(x - 1, y)) \
-                   or (is_walkable(next_x + 1, next_y) and not is_walkable(x + 1, y)):
-                    return (next_x, next_y)
-
-            return jump(next_x, next_y, dx, dy)
-
-        def get_neighbors(x, y):
-            dirs = []
-            for dx, dy in [(-1, 0), (1, 0), (0, -1), (0, 1)]:
-                nx, ny = x + dx, y + dy
-                if is_walkable(nx, ny):
-                    dirs.append((dx, dy))
-            return dirs
-
-        open_list = [(0, start)]
-        g_cost = {start: 0}
-        heapq.heapify(open_list)
-
-        while open_list:
-            _, current = heapq.heappop(open_list)
-            if current == goal:
-                self._distance_cache[(start, goal)] = g_cost[current]
-                self._distance_cache[(goal, start)] = g_cost[current]
-                return g_cost[current]
-
-            x, y = current
-            for dx, dy in get_neighbors(x, y):
-                jump_point = jump(x, y, dx, dy)
-                if jump_point:
-                    new_g = g_cost[current] + 1  
-                    if jump_point not in g_cost or new_g < g_cost[jump_point]:
-                        g_cost[jump_point] = new_g
-                        heapq.heappush(open_list, (new_g, jump_point))
-        return 9999  
+    def get_maze_distance(self, start, goal):
+        dist = self.get_distance_oracle().distance(start, goal)
+        if dist is None:
+            return 9999
+        return dist
 
     def _get_start_state(self):
         pacman_pos = self._find_char_in_maze('P')
         food_list = self._find_all_chars_in_maze('.')
-        return (pacman_pos, frozenset(food_list))
+        return self.make_state(pacman_pos, food_list)
 
     def _find_char_in_maze(self, char):
-        for y, row in enumerate(self.maze.map_data):
-            for x, cell in enumerate(row):
-                if cell == char:
-                    return (x, y)
-        return None
+        i = self.maze.cells.find(ord(char))
+        if i == -1:
+            return None
+        return (i % self.maze.tile_width, i // self.maze.tile_width)
 
     def _find_all_chars_in_maze(self, char):
-        positions = []
-        for y, row in enumerate(self.maze.map_data):
-            for x, cell in enumerate(row):
-                if cell == char:
-                    positions.append((x, y))
-        return positions
+        return self.maze.find_all(ord(char))
 
 # ==============================
 #  Heuristic A*
 # ==============================
-def heuristic(state, problem):
+class MSTCache:
+    """LRU cache (cost, edges) của MST theo bitmask food, có đếm hit/miss."""
+
+    def __init__(self, maxsize=4096):
+        self.maxsize = maxsize
+        self._entries = OrderedDict()
+        self.hits = 0
+        self.misses = 0
+        self.derived = 0
+
+    def clear(self):
+        self._entries.clear()
+
+    def peek(self, mask):
+        return self._entries.get(mask)
+
+    def lookup(self, mask):
+        entry = self._entries.get(mask)
+        if entry is None:
+            self.misses += 1
+            return None
+        self._entries.move_to_end(mask)
+        self.hits += 1
+        return entry
+
+    def store(self, mask, entry):
+        self._entries[mask] = entry
+        self._entries.move_to_end(mask)
+        if len(self._entries) > self.maxsize:
+            self._entries.popitem(last=False)
+
+
+def _build_mst(food_list, problem):
+    # Prim trên khoảng cách maze, trả về (tổng chi phí, các cạnh (u, v, cost))
+    visited = {food_list[0]}
+    edges = []
+    mst_edges = []
+    mst_cost = 0
+
+    for i in range(1, len(food_list)):
+        cost = problem.get_maze_distance(food_list[0], food_list[i])
+        heapq.heappush(edges, (cost, food_list[0], food_list[i]))
+
+    while edges and len(visited) < len(food_list):
+        cost, u, v = heapq.heappop(edges)
+
+        if v in visited:
+            continue
+
+        visited.add(v)
+        mst_cost += cost
+        mst_edges.append((u, v, cost))
+
+        for food_neighbor in food_list:
+            if food_neighbor not in visited:
+                new_cost = problem.get_maze_distance(v, food_neighbor)
+                heapq.heappush(edges, (new_cost, v, food_neighbor))
+
+    return mst_cost, tuple(mst_edges)
+
+
+def _mst_without_leaf(mst, cell):
+    """MST sau khi bỏ cell, chỉ khi cell là lá (bỏ lá của MST vẫn là MST); ngược lại None."""
+    cost, edges = mst
+    touching = [e for e in edges if e[0] == cell or e[1] == cell]
+    if len(touching) != 1:
+        return None
+    edge = touching[0]
+    return cost - edge[2], tuple(e for e in edges if e is not edge)
+
+
+def heuristic(state, problem, parent_state=None):
     
-    pacman_pos, food_set = state
-    if not food_set:
+    pacman_pos, food_mask = state
+    if not food_mask:
         exit_pos = getattr(problem, "exit_pos", None)
         if exit_pos:
             return problem.get_maze_distance(pacman_pos, exit_pos)
         return 0
 
-    food_list = list(food_set)
+    food_list = problem.food_index.decode(food_mask)
 
     min_dist_to_food = float('inf')
     for food in food_list:
@@ -196,104 +367,361 @@ def heuristic(state, problem):
 
     mst_cost = 0
     if len(food_list) > 1:
-        visited = {food_list[0]}
-        edges = []
-        
-        for i in range(1, len(food_list)):
-            cost = problem.get_maze_distance(food_list[0], food_list[i])
-            heapq.heappush(edges, (cost, food_list[0], food_list[i]))
-
-        while edges and len(visited) < len(food_list):
-            cost, u, v = heapq.heappop(edges)
-
-            if v in visited:
-                continue
-            
-            visited.add(v)
-            mst_cost += cost
-
-            for food_neighbor in food_list:
-                if food_neighbor not in visited:
-                    new_cost = problem.get_maze_distance(v, food_neighbor)
-                    heapq.heappush(edges, (new_cost, v, food_neighbor))
+        cache = problem.mst_cache
+        mst = cache.lookup(food_mask)
+        if mst is None:
+            if parent_state is not None and parent_state[1] != food_mask:
+                # Vừa ăn đúng một food: nếu nó là lá của MST cha thì bỏ cạnh đó là xong
+                parent_mst = cache.peek(parent_state[1])
+                if parent_mst is not None:
+                    removed = problem.food_index.decode(parent_state[1] & ~food_mask)
+                    if len(removed) == 1:
+                        mst = _mst_without_leaf(parent_mst, removed[0])
+                        if mst is not None:
+                            cache.derived += 1
+            if mst is None:
+                mst = _build_mst(food_list, problem)
+            cache.store(food_mask, mst)
+        mst_cost = mst[0]
 
     food_heuristic = min_dist_to_food + mst_cost
 
-    danger_penalty = 0
-    try:
-        if hasattr(problem.maze, "game") and hasattr(problem.maze.game, "ghosts"):
-            for ghost in problem.maze.game.ghosts:
-                ghost_pos = (int(round(ghost.grid_pos.x)), int(round(ghost.grid_pos.y)))
-                grid_dist = abs(ghost_pos[0] - pacman_pos[0]) + abs(ghost_pos[1] - pacman_pos[1])
-                if grid_dist <= 1: danger_penalty += 1500 # Tăng hình phạt
-                elif grid_dist <= 3: danger_penalty += 500
-    except Exception:
-        pass
-    return food_heuristic + danger_penalty
+    danger = problem.danger if problem.danger is not None else problem.update_danger_field()
+    return food_heuristic + danger.penalty.get(pacman_pos, 0)
 # ==============================
 #  A* Search
 # ==============================
-def a_star_search(problem, return_cost=False):
+class SearchCancelled(Exception):
+    """Lần tìm bị huỷ giữa chừng (cancel được set), không có kết quả."""
+
+
+# Số node mở rộng giữa hai lần kiểm tra cờ huỷ
+CANCEL_CHECK_INTERVAL = 128
+
+class SearchStats:
+    """Bộ đếm của một lần tìm kiếm (benchmark / đo đạc).
+
+    distance_* / mst_* là phần chênh của bộ đếm cache trong DistanceOracle và
+    MSTCache trong lúc tìm, ghi lại bởi begin() / end().
+    """
+    __slots__ = ('expanded', 'pushes', 'peak_frontier', 'heuristic_calls',
+                 'distance_hits', 'distance_misses', 'mst_hits', 'mst_misses', '_snapshot')
+
+    def __init__(self):
+        self.expanded = 0
+        self.pushes = 0
+        self.peak_frontier = 0
+        self.heuristic_calls = 0
+        self.distance_hits = 0
+        self.distance_misses = 0
+        self.mst_hits = 0
+        self.mst_misses = 0
+        self._snapshot = None
+
+    def begin(self, problem):
+        oracle, cache = problem.get_distance_oracle(), problem.mst_cache
+        self._snapshot = (oracle, oracle.hits, oracle.misses, cache, cache.hits, cache.misses)
+
+    def end(self):
+        oracle, d_hits, d_misses, cache, m_hits, m_misses = self._snapshot
+        self.distance_hits += oracle.hits - d_hits
+        self.distance_misses += oracle.misses - d_misses
+        self.mst_hits += cache.hits - m_hits
+        self.mst_misses += cache.misses - m_misses
+        self._snapshot = None
+
+    @property
+    def distance_hit_rate(self):
+        total = self.distance_hits + self.distance_misses
+        return self.distance_hits / total if total else None
+
+    @property
+    def mst_hit_rate(self):
+        total = self.mst_hits + self.mst_misses
+        return self.mst_hits / total if total else None
+
+    def as_dict(self):
+        data = {name: getattr(self, name) for name in self.__slots__ if name != '_snapshot'}
+        data['distance_hit_rate'] = self.distance_hit_rate
+        data['mst_hit_rate'] = self.mst_hit_rate
+        return data
+
+
+class SearchNode:
+    """Node của A*: chỉ giữ con trỏ tới node cha, đường đi dựng lại một lần khi tới goal."""
+    __slots__ = ('state', 'parent', 'action', 'g')
+
+    def __init__(self, state, parent, action, g):
+        self.state = state
+        self.parent = parent
+        self.action = action
+        self.g = g
+
+    def path(self):
+        actions = []
+        node = self
+        while node.parent is not None:
+            actions.append(node.action)
+            node = node.parent
+        actions.reverse()
+        return actions
+
+
+def _path_to_exit(problem, start, exit_pos):
+    parents = {start: None}
+    queue = deque([start])
+    while queue:
+        curr = queue.popleft()
+        if curr == exit_pos:
+            actions = []
+            while parents[curr] is not None:
+                curr, action = parents[curr]
+                actions.append(action)
+            actions.reverse()
+            return actions
+        x, y = curr
+        for dx, dy, action in [(-1, 0, 'West'), (1, 0, 'East'),
+                               (0, -1, 'North'), (0, 1, 'South')]:
+            next_x, next_y = x + dx, y + dy
+            next_pos = (next_x, next_y)
+            if not problem.maze.is_wall(next_x, next_y) and next_pos not in parents:
+                parents[next_pos] = (curr, action)
+                queue.append(next_pos)
+    return []
+
+
+def _a_star(problem, start_state, splice=None, stats=None, cancel=None):
+    """A* từ start_state. Trả về (node, g, spliced) hoặc None nếu không có đường.
+
+    splice: {state: chi phí còn lại đã biết}. Khi sinh ra một state trong splice,
+    đường đi có thể dừng ở đó (nối vào phần kế hoạch cũ) với chi phí g + splice[state].
+    stats: SearchStats (tuỳ chọn) để đếm node mở rộng, push, lần gọi heuristic và cache.
+    cancel: threading.Event (tuỳ chọn); khi được set, ném SearchCancelled.
+    """
+    if stats is None:
+        return _a_star_loop(problem, start_state, splice, None, cancel)
+    stats.begin(problem)
+    try:
+        return _a_star_loop(problem, start_state, splice, stats, cancel)
+    finally:
+        stats.end()
+
+
+def _a_star_loop(problem, start_state, splice, stats, cancel):
     frontier = []
-    start_state = problem.get_start_state()
-    heapq.heappush(frontier, (0, 0, [], start_state))
+    # best_g: g nhỏ nhất đã push cho mỗi state, bỏ qua các lần push kém hơn
+    best_g = {start_state: 0}
+    counter = 0
+    heapq.heappush(frontier, (0, 0, counter, SearchNode(start_state, None, None, 0), False))
     explored = set()
+    pops = 0
 
     while frontier:
-        f_cost, g_cost, path, current_state = heapq.heappop(frontier)
-
-        pacman_pos, food_set = current_state
-        hashable_state = (pacman_pos, tuple(sorted(food_set)))
-        if hashable_state in explored:
+        pops += 1
+        if cancel is not None and pops % CANCEL_CHECK_INTERVAL == 0 and cancel.is_set():
+            raise SearchCancelled()
+        f_cost, g_cost, _, node, spliced = heapq.heappop(frontier)
+        current_state = node.state
+
+        if spliced:
+            return node, g_cost, True
+        if current_state in explored or g_cost > best_g[current_state]:
             continue
-        explored.add(hashable_state)
+        explored.add(current_state)
+        if stats is not None:
+            stats.expanded += 1
+            stats.peak_frontier = max(stats.peak_frontier, len(frontier) + 1)
 
         if problem.is_goal_state(current_state):
-            last_pos = current_state[0]
-            exit_pos = problem.exit_pos
-            total_cost = g_cost
-
-            if exit_pos:
-                queue = [(last_pos, [])]
-                visited_exit_path = {last_pos}
-                path_to_exit = []
-                while queue:
-                    curr, p = queue.pop(0)
-                    if curr == exit_pos:
-                        path_to_exit = p
-                        break
-                    x, y = curr
-                    for dx, dy, action in [(-1, 0, 'West'), (1, 0, 'East'),
-                                           (0, -1, 'North'), (0, 1, 'South')]:
-                        next_x, next_y = x + dx, y + dy
-                        next_pos = (next_x, next_y)
-                        if (0 <= next_y < len(problem.maze.map_data)
-                            and 0 <= next_x < len(problem.maze.map_data[next_y])
-                            and problem.maze.map_data[next_y][next_x] != '%'
-                            and next_pos not in visited_exit_path):
-                            visited_exit_path.add(next_pos)
-                            queue.append((next_pos, p + [action]))
-                full_path = path + path_to_exit
-                total_cost += len(path_to_exit)
-            else:
-                full_path = path
-
-            full_path = full_path + ['Stop']
-
-            if return_cost:
-                return full_path, total_cost
-            return full_path
+            return node, g_cost, False
 
         for next_state, action, cost in problem.get_successors(current_state):
-            pac_next, food_next = next_state
-            hashable_next = (pac_next, tuple(sorted(food_next)))
-            if hashable_next not in explored:
-                new_g = g_cost + cost
-                h = heuristic(next_state, problem)
-                new_f = new_g + h
-                new_path = path + [action]
-                heapq.heappush(frontier, (new_f, new_g, new_path, next_state))
+            if next_state in explored:
+                continue
+            new_g = g_cost + cost
+            if splice and next_state in splice:
+                counter += 1
+                total = new_g + splice[next_state]
+                heapq.heappush(frontier, (total, total, counter,
+                                          SearchNode(next_state, node, action, new_g), True))
+            if new_g >= best_g.get(next_state, float('inf')):
+                continue
+            best_g[next_state] = new_g
+            h = heuristic(next_state, problem, current_state)
+            counter += 1
+            heapq.heappush(frontier, (new_g + h, new_g, counter,
+                                      SearchNode(next_state, node, action, new_g), False))
+            if stats is not None:
+                stats.pushes += 1
+                stats.heuristic_calls += 1
+    return None
+
+
+def a_star_search(problem, return_cost=False, stats=None):
+    problem.update_danger_field()
+    result = _a_star(problem, problem.get_start_state(), stats=stats)
+    if result is None:
+        if return_cost:
+            return [], 0
+        return []
+
+    node, total_cost, _ = result
+    full_path = node.path()
+    exit_pos = problem.exit_pos
+    if exit_pos:
+        path_to_exit = _path_to_exit(problem, node.state[0], exit_pos)
+        full_path += path_to_exit
+        total_cost += len(path_to_exit)
+
+    full_path.append('Stop')
 
     if return_cost:
-        return [], 0
-    return []
+        return full_path, total_cost
+    return full_path
+
+
+# ==============================
+#  Anytime A* (ARA*)
+# ==============================
+# Trọng số heuristic giảm dần; 1.0 ở cuối là A* thường
+ANYTIME_WEIGHTS = (5.0, 3.0, 2.0, 1.5, 1.2, 1.0)
+# Số node mở rộng giữa hai lần xem cờ huỷ (đồng hồ được xem sau mỗi node)
+_ANYTIME_CHECK_INTERVAL = 64
+
+
+class _BudgetExhausted(Exception):
+    pass
+
+
+def _anytime_a_star(problem, start_state, weights=ANYTIME_WEIGHTS, deadline=None,
+                    node_budget=None, stats=None, cancel=None, partial=False):
+    """ARA*: weighted A* với w giảm dần, dùng lại g / OPEN / INCONS giữa các vòng.
+
+    deadline: mốc time.perf_counter() phải dừng; node_budget: số node mở rộng tối đa.
+    Trả về (node, g, bound) của lời giải tốt nhất khi hết ngân sách hoặc đã xong w = 1,
+    None nếu chưa tìm được lời giải nào. bound: hệ số chênh tối đa so với lời giải
+    tối ưu (1.0 = tối ưu) theo heuristic; heuristic có phạt ma nên đây là cận danh nghĩa.
+    partial: hết ngân sách trước lời giải đầu tiên thì trả về (node, g, None), node là
+    điểm cuối một kế hoạch dở (_partial_node) để đi trước rồi lập lại.
+    """
+    h_cache = {}
+
+    def h(state, parent=None):
+        value = h_cache.get(state)
+        if value is None:
+            value = heuristic(state, problem, parent)
+            h_cache[state] = value
+            if stats is not None:
+                stats.heuristic_calls += 1
+        return value
+
+    g = {start_state: 0}
+    nodes = {start_state: SearchNode(start_state, None, None, 0)}
+    open_states = {start_state}
+    incons = set()
+    best = None          # (objective, node): objective = g + h của goal (h = tới exit)
+    bound = None
+    expanded = 0
+    counter = 0
+
+    if stats is not None:
+        stats.begin(problem)
+    try:
+        for w in weights:
+            frontier = []
+            open_states |= incons
+            incons = set()
+            for state in open_states:
+                counter += 1
+                frontier.append((g[state] + w * h(state), counter, state, g[state]))
+            heapq.heapify(frontier)
+            closed = set()
+
+            try:
+                while frontier:
+                    key, _, state, g_pushed = frontier[0]
+                    if best is not None and best[0] <= key:
+                        break
+                    heapq.heappop(frontier)
+                    if state in closed or g_pushed != g[state]:
+                        continue
+                    open_states.discard(state)
+                    closed.add(state)
+
+                    expanded += 1
+                    if stats is not None:
+                        stats.expanded += 1
+                        stats.peak_frontier = max(stats.peak_frontier, len(frontier) + 1)
+                    if node_budget is not None and expanded >= node_budget:
+                        raise _BudgetExhausted()
+                    if deadline is not None and time.perf_counter() >= deadline:
+                        raise _BudgetExhausted()
+                    if expanded % _ANYTIME_CHECK_INTERVAL == 0 and cancel is not None and cancel.is_set():
+                        raise SearchCancelled()
+
+                    node = nodes[state]
+                    g_state = g[state]
+                    for next_state, action, cost in problem.get_successors(state):
+                        new_g = g_state + cost
+                        if new_g >= g.get(next_state, float('inf')):
+                            continue
+                        g[next_state] = new_g
+                        next_node = SearchNode(next_state, node, action, new_g)
+                        nodes[next_state] = next_node
+                        h_next = h(next_state, state)
+                        if problem.is_goal_state(next_state):
+                            if best is None or new_g + h_next < best[0]:
+                                best = (new_g + h_next, next_node)
+                        if next_state in closed:
+                            # Đã mở rộng ở vòng này: để dành cho vòng sau (INCONS)
+                            incons.add(next_state)
+                        else:
+                            open_states.add(next_state)
+                            counter += 1
+                            heapq.heappush(frontier, (new_g + w * h_next, counter, next_state, new_g))
+                            if stats is not None:
+                                stats.pushes += 1
+            except _BudgetExhausted:
+                if best is not None:
+                    bound = _anytime_bound(best[0], w, g, h, open_states | incons)
+                elif partial:
+                    node = _partial_node(problem, start_state, nodes, g, h, open_states | incons)
+                    if node is not None:
+                        return node, node.g, None
+                break
+
+            if best is not None:
+                bound = _anytime_bound(best[0], w, g, h, open_states | incons)
+    finally:
+        if stats is not None:
+            stats.end()
+
+    if best is None:
+        return None
+    node = best[1]
+    return node, node.g, bound
+
+
+def _partial_node(problem, start_state, nodes, g, h, pending):
+    """Cuối kế hoạch dở: state chờ mở rộng có g + h nhỏ nhất (bằng nhau thì h nhỏ hơn);
+    chưa có thì một bước tham lam từ start. None nếu start không đi đâu được."""
+    pending = [state for state in pending if state != start_state]
+    if pending:
+        return nodes[min(pending, key=lambda state: (g[state] + h(state), h(state)))]
+    root = nodes[start_state]
+    best = None
+    for next_state, action, cost in problem.get_successors(start_state):
+        h_next = h(next_state, start_state)
+        if best is None or (cost + h_next, h_next) < best[0]:
+            best = ((cost + h_next, h_next), SearchNode(next_state, root, action, cost))
+    return best[1] if best is not None else None
+
+
+def _anytime_bound(objective, w, g, h, pending):
+    """Cận ARA*: min(w, chi phí lời giải / min(g + h) trên OPEN ∪ INCONS)."""
+    if not pending:
+        return 1.0
+    lower = min(g[state] + h(state) for state in pending)
+    if lower <= 0:
+        return w
+    return max(1.0, min(w, objective / lower))
@@ -10,12 +10,28 @@ YELLOW = (255, 255, 0)
 # Kích thước của mỗi ô trong maze
 TILE_SIZE = 20
 
+# --- Khung nhìn ---
+# Cửa sổ không lớn hơn SCREEN_WIDTH x SCREEN_HEIGHT; map lớn hơn thì camera đi theo Pacman.
+# Nền được vẽ theo từng khối CHUNK_TILES x CHUNK_TILES ô, giữ tối đa CHUNK_CACHE khối
+CHUNK_TILES = 16
+CHUNK_CACHE = 64
+
 # --- Cài đặt Gameplay ---
 MAZE_ROTATION_STEPS = 30       
 POWER_UP_DURATION = 5000  
 
 # --- Cài đặt AI ---
 AUTO_REPLAN_GHOST_DISTANCE = 4 
+# Số bước sắp tới của kế hoạch được kiểm tra xem có ma trong AUTO_REPLAN_GHOST_DISTANCE không
+AUTO_REPLAN_LOOKAHEAD = 8
+
+# Từ ngần này food trở lên thì lập kế hoạch theo lộ trình (route.py) thay vì A* trên cả tập food
+# (map 31x31: A* đầy đủ ~0.1 s với 8 food, ~1 s với 14 food; lộ trình < 10 ms)
+ROUTE_PLANNER_MIN_FOOD = 8
+
+# --- Turbo (phím T trong auto mode) ---
+TURBO_STEPS = (8, 32)          # số bước mô phỏng cho mỗi frame được vẽ
+TURBO_REFRESH_MS = 500         # chế độ 'events': vẽ lại ít nhất sau ngần này ms
 
 # --- MÀU MỚI ---
 DARK_WALL = (0, 0, 50)  # Màu tường sẫm hơn
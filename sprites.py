@@ -0,0 +1,99 @@
+import pygame
+from collections import OrderedDict
+from settings import *
+
+EXIT_COLOR = (50, 255, 50)
+EXIT_BORDER = (0, 100, 0)
+# Màu nền trong suốt của sprite actor (colorkey blit nhanh hơn alpha từng pixel)
+_KEYS = ((255, 0, 255), (0, 255, 255))
+
+
+class SpriteCache:
+    """Surface TILE_SIZE x TILE_SIZE vẽ sẵn cho actor và các ô nền; mỗi (loại, màu) chỉ vẽ một lần.
+
+    Pacman (thường / power-up / lúc teleport) và ma chỉ khác màu nên dùng chung actor(color).
+    Ô nền vẽ sẵn trên nền BLACK như khối nền của Maze nên blit không cần trộn alpha.
+    Vẽ bằng blit cho ra đúng các pixel như pygame.draw trực tiếp lên màn hình.
+    """
+
+    def __init__(self):
+        self._sprites = {}
+
+    def _new(self, background=BLACK):
+        surface = pygame.Surface((TILE_SIZE, TILE_SIZE))
+        if pygame.display.get_surface() is not None:
+            surface = surface.convert()
+        surface.fill(background)
+        return surface
+
+    def actor(self, color):
+        key = ('actor', color)
+        sprite = self._sprites.get(key)
+        if sprite is None:
+            key_color = _KEYS[1] if tuple(color[:3]) == _KEYS[0] else _KEYS[0]
+            sprite = self._new(key_color)
+            pygame.draw.circle(sprite, color, (TILE_SIZE // 2, TILE_SIZE // 2), TILE_SIZE // 2 - 2)
+            sprite.set_colorkey(key_color, pygame.RLEACCEL)
+            self._sprites[key] = sprite
+        return sprite
+
+    def tile(self, tile):
+        """Ô nền: '%' tường, 'E' cổng ra, '.' food, 'O' power-up; None với ô trống."""
+        key = ('tile', tile)
+        if key in self._sprites:
+            return self._sprites[key]
+        sprite = None
+        center = (TILE_SIZE // 2, TILE_SIZE // 2)
+        rect = pygame.Rect(0, 0, TILE_SIZE, TILE_SIZE)
+        if tile == '%':
+            # Nền tối + viền sáng cho cảm giác 3D
+            sprite = self._new()
+            pygame.draw.rect(sprite, DARK_WALL, rect)
+            pygame.draw.rect(sprite, BLUE, rect, 2)
+        elif tile == 'E':
+            sprite = self._new()
+            pygame.draw.rect(sprite, EXIT_COLOR, rect)
+            pygame.draw.rect(sprite, EXIT_BORDER, rect, 2)
+        elif tile == '.':
+            sprite = self._new()
+            pygame.draw.circle(sprite, FOOD_COLOR, center, 3)
+        elif tile == 'O':
+            # Vòng tròn ngoài + chấm đặc bên trong
+            sprite = self._new()
+            pygame.draw.circle(sprite, POWER_UP_COLOR, center, TILE_SIZE // 2 - 4, 1)
+            pygame.draw.circle(sprite, FOOD_COLOR, center, TILE_SIZE // 4)
+        self._sprites[key] = sprite
+        return sprite
+
+
+class TextCache:
+    """Surface chữ của một font theo (chuỗi, màu), LRU tối đa max_entries.
+
+    HUD vẽ lại cùng chuỗi gần như mọi frame; chỉ chuỗi mới (vd. điểm vừa đổi) mới phải render.
+    """
+
+    def __init__(self, font, max_entries=128, antialias=True):
+        self.font = font
+        self.max_entries = max_entries
+        self.antialias = antialias
+        self.hits = 0
+        self.misses = 0
+        self._surfaces = OrderedDict()
+
+    def render(self, text, color):
+        key = (text, color)
+        surface = self._surfaces.get(key)
+        if surface is not None:
+            self.hits += 1
+            self._surfaces.move_to_end(key)
+            return surface
+        self.misses += 1
+        surface = self.font.render(text, self.antialias, color)
+        self._surfaces[key] = surface
+        if len(self._surfaces) > self.max_entries:
+            self._surfaces.popitem(last=False)
+        return surface
+
+
+# Dùng chung cho Pacman, GhostSwarm và Maze
+SPRITES = SpriteCache()
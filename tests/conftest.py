@@ -0,0 +1,7 @@
+import os
+import sys
+
+# Chạy không cần màn hình; import module game từ thư mục gốc repo
+os.environ.setdefault('PYGAME_HIDE_SUPPORT_PROMPT', '1')
+os.environ.setdefault('SDL_VIDEODRIVER', 'dummy')
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
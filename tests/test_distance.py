@@ -0,0 +1,51 @@
+from collections import deque
+
+import pytest
+
+from maze import Maze
+from search import PacmanSearchProblem
+
+MAP = 'maps/task02_pacman_example_map.txt'
+DELTAS = {'West': (-1, 0), 'East': (1, 0), 'North': (0, -1), 'South': (0, 1)}
+
+
+def forward_distances(problem, start):
+    """BFS xuôi theo get_successors: tới ô là đứng ở đó hoặc bước vào nó (góc teleport)."""
+    width = problem.maze.tile_width
+    dist = {start: 0}
+    reached = {start: 0}
+    queue = deque([start])
+    while queue:
+        pos = queue.popleft()
+        d = dist[pos]
+        for (next_pos, _), action, _ in problem.get_successors((pos, 0)):
+            dx, dy = DELTAS[action]
+            entered = ((pos[0] + dx) % width, pos[1] + dy)
+            reached.setdefault(entered, d + 1)
+            reached.setdefault(next_pos, d + 1)
+            if next_pos not in dist:
+                dist[next_pos] = d + 1
+                queue.append(next_pos)
+    return reached
+
+
+@pytest.fixture(scope='module')
+def problem():
+    return PacmanSearchProblem(Maze(MAP))
+
+
+def test_corner_food_is_reached_through_teleport(problem):
+    assert (1, 16) in problem.maze.teleport_corners
+    assert problem.get_maze_distance((2, 1), (1, 16)) == 1
+
+
+def test_oracle_matches_forward_bfs(problem):
+    oracle = problem.get_distance_oracle()
+    maze = problem.maze
+    sources = list(oracle._rows)
+    cells = [(x, y) for y in range(maze.tile_height) for x in range(maze.tile_width)
+             if not maze.is_wall(x, y)]
+    for a in cells:
+        reached = forward_distances(problem, a)
+        for b in sources:
+            assert oracle.distance(a, b) == reached.get(b), (a, b)
@@ -0,0 +1,69 @@
+from types import SimpleNamespace
+
+import pygame
+import pytest
+
+from ghost import GhostSwarm
+from maze import Maze
+from settings import TILE_SIZE
+
+# Ma ở (3, 2) kẹt giữa hai bức tường (đỗ, rung 1 px); hai con dưới đi lại trong hành lang
+MAP = [
+    '%%%%%%%%%',
+    '%P     E%',
+    '%%%G%%%%%',
+    '% %     %',
+    '%G   G  %',
+    '%%%%%%%%%',
+]
+
+
+class ReferenceGhost:
+    """Mô hình cũ: mỗi con ma tự cập nhật từng frame (trước khi có GhostSwarm)."""
+
+    def __init__(self, game, pos):
+        self.game = game
+        self.grid_pos = pygame.Vector2(pos)
+        self.pix_pos = pygame.Vector2(self.grid_pos.x * TILE_SIZE, self.grid_pos.y * TILE_SIZE)
+        self.direction = pygame.Vector2(1, 0)
+        self.speed = 1
+
+    def update(self):
+        next_grid_pos = self.grid_pos + self.direction
+        width, height = self.game.maze.tile_width, self.game.maze.tile_height
+        if not (0 <= next_grid_pos.x < width and 0 <= next_grid_pos.y < height and
+                not self.game.maze.is_wall(int(next_grid_pos.x), int(next_grid_pos.y))):
+            self.direction *= -1
+        self.pix_pos += self.direction * self.speed
+        margin = self.speed / 2
+        if self.pix_pos.x % TILE_SIZE < margin and self.pix_pos.y % TILE_SIZE < margin:
+            self.pix_pos.x = round(self.pix_pos.x / TILE_SIZE) * TILE_SIZE
+            self.pix_pos.y = round(self.pix_pos.y / TILE_SIZE) * TILE_SIZE
+            self.grid_pos[0] = self.pix_pos[0] // TILE_SIZE
+            self.grid_pos[1] = self.pix_pos[1] // TILE_SIZE
+
+
+def snapshot(ghost):
+    return (tuple(map(int, ghost.grid_pos)), tuple(map(int, ghost.pix_pos)),
+            tuple(map(int, ghost.direction)))
+
+
+@pytest.mark.parametrize('period', [7, 8, 30, 45])
+def test_swarm_matches_per_ghost_update_across_rotations(tmp_path, period):
+    path = tmp_path / 'ghosts.txt'
+    path.write_text('\n'.join(MAP) + '\n')
+    reference_maze = Maze(str(path), use_compiled=False)
+    swarm_maze = Maze(str(path), use_compiled=False)
+    positions = reference_maze.find_all(ord('G'))
+    reference = [ReferenceGhost(SimpleNamespace(maze=reference_maze), pos) for pos in positions]
+    swarm = GhostSwarm(SimpleNamespace(maze=swarm_maze), positions)
+
+    for frame in range(1, 8 * period + 1):
+        if frame % period == 0:
+            # Như Pacman.update: maze xoay trước khi ma cập nhật trong cùng frame
+            reference_maze.rotate_maze_90_right(ghosts=reference)
+            swarm_maze.rotate_maze_90_right(ghosts=swarm)
+        for ghost in reference:
+            ghost.update()
+        swarm.update()
+        assert [snapshot(g) for g in swarm] == [snapshot(g) for g in reference], frame
@@ -0,0 +1,20 @@
+import pytest
+
+from mapgen import _bfs_distances, generate_maze
+
+
+@pytest.mark.parametrize('width, height', [(20, 20), (21, 20), (20, 21), (21, 21)])
+def test_maze_has_single_wall_border(width, height):
+    rows = generate_maze(width, height, seed=3, food=5, ghosts=2)
+    assert len(rows) == height and all(len(row) == width for row in rows)
+    # Hàng/cột trong cùng phải có ô đi được, kể cả khi chiều là số chẵn
+    assert any(row[width - 2] != '%' for row in rows)
+    assert any(ch != '%' for ch in rows[height - 2])
+
+
+def test_every_open_cell_is_reachable_on_even_maze():
+    rows = generate_maze(20, 20, seed=5, food=5, ghosts=2)
+    grid = [bytearray(row, 'ascii') for row in rows]
+    pacman = next((x, y) for y, row in enumerate(rows) for x, ch in enumerate(row) if ch == 'P')
+    open_cells = {(x, y) for y, row in enumerate(rows) for x, ch in enumerate(row) if ch != '%'}
+    assert set(_bfs_distances(grid, pacman)) == open_cells
@@ -0,0 +1,122 @@
+import time
+
+from headless import HeadlessGame
+from mapgen import generate_maze, write_map
+from maze import Maze
+from planner import IncrementalPlanner, PlanFollower
+from search import PacmanSearchProblem
+
+EVENTS = (0, None, False)
+FOOD = 0b1
+
+# Đi thẳng sang phải 4 ô rồi dừng; bước đầu tốn 5 (gần ma)
+PATH = ['East', 'East', 'East', 'East', 'Stop']
+STATES = [((x, 1), FOOD) for x in range(1, 6)]
+COSTS = [5, 1, 1, 1, 0]
+
+
+def make_follower():
+    follower = PlanFollower()
+    follower.adopt(PATH, STATES, COSTS, EVENTS, [])
+    return follower
+
+
+def test_follow_returns_remaining_cost_of_weighted_steps():
+    follower = make_follower()
+    assert follower.follow(STATES[0], EVENTS, []) == ('East', 8)
+    assert follower.follow(STATES[1], EVENTS, []) == ('East', 3)
+    assert follower.follow(STATES[4], EVENTS, []) is None
+    assert follower.last_trigger == 'end'
+
+
+def test_plan_is_followed_only_up_to_rotation_horizon():
+    follower = PlanFollower()
+    follower.adopt(PATH, STATES, COSTS, EVENTS, [], horizon=2)
+    assert follower.follow(STATES[0], EVENTS, []) == ('East', 8)
+    assert follower.follow(STATES[1], EVENTS, []) == ('East', 3)
+    assert follower.follow(STATES[2], EVENTS, []) is None
+    assert follower.last_trigger == 'horizon'
+
+
+def test_revisiting_state_without_eating_is_a_cycle():
+    follower = make_follower()
+    for state in STATES[:3]:
+        assert follower.follow(state, EVENTS, []) is not None
+    # Nhiều frame liền nhau ở cùng ô không phải vòng lặp
+    assert follower.follow(STATES[2], EVENTS, []) is not None
+    assert follower.follow(STATES[1], EVENTS, []) is None
+    assert follower.last_trigger == 'cycle'
+    # Cùng ô nhưng maze đã xoay: state khác
+    assert follower.follow(STATES[2], (1, None, False), []) is None
+    assert follower.last_trigger == 'rotation'
+
+
+def test_revisit_after_eating_food_is_not_a_cycle():
+    follower = make_follower()
+    follower.follow(STATES[0], EVENTS, [])
+    follower.follow(STATES[1], EVENTS, [])
+    eaten = [(pos, 0) for pos, _ in STATES]
+    follower.adopt(PATH, eaten, COSTS, EVENTS, [])
+    follower.follow(eaten[0], EVENTS, [])
+    assert follower.follow(eaten[1], EVENTS, []) is not None
+
+
+def test_auto_mode_reaches_teleport_exit_across_rotations(tmp_path):
+    # Exit ở góc teleport, kế hoạch 96-178 bước: chỉ lập lại khi xoay thì đi vòng mãi
+    path = tmp_path / 'teleport_exit.txt'
+    write_map(generate_maze(31, 31, seed=7, food=10, ghosts=2, loops=10), str(path))
+    result = HeadlessGame(str(path), seed=1).run(max_steps=3000)
+    assert result['outcome'] == 'win'
+    assert result['food_left'] == 0
+
+
+def test_auto_mode_mostly_follows_the_plan():
+    # Kế hoạch dài hơn lần xoay kế tiếp vẫn được đi theo tới lúc xoay, không lập lại mỗi ô
+    result = HeadlessGame('maps/task02_pacman_example_map.txt', seed=1).run()
+    assert result['outcome'] == 'win'
+    assert result['follows'] > 3 * result['plans']
+
+
+def test_safe_step_never_enters_a_ghost_adjacent_cell(monkeypatch):
+    game = HeadlessGame('maps/task02_pacman_example_map.txt', seed=1)
+    game.reset_pacman()
+    state = game.problem.get_start_state()
+    moves = {action: next_state[0] for next_state, action, _ in game.problem.get_successors(state)}
+    action, pos = next(iter(moves.items()))
+    # Ô kế hoạch đi tới sát ma: né sang ô ít phạt hơn, không còn ô nào thì đứng yên
+    penalty = {pos: 1500, state[0]: 500}
+    danger = type('Danger', (), {'penalty': penalty})
+    monkeypatch.setattr(game.problem, 'update_danger_field', lambda: danger)
+    assert game.safe_step(state, (action, 7))[0] not in (action, 'Stop')
+    penalty.update({cell: 1500 for cell in moves.values()})
+    assert game.safe_step(state, (action, 7)) == ('Stop', 0)
+    assert game.safe_step(state, None) == ('Stop', 0)
+
+
+def budget_problem(tmp_path):
+    # 20 food trên map 41x41: A* cần hàng trăm ms cho lời giải đầu tiên
+    path = tmp_path / 'budget.txt'
+    write_map(generate_maze(41, 41, seed=1, food=20, ghosts=2, loops=10), str(path))
+    return PacmanSearchProblem(Maze(str(path)))
+
+
+def test_time_budget_holds_before_first_solution(tmp_path):
+    problem = budget_problem(tmp_path)
+    planner = IncrementalPlanner(problem, time_budget=0.005)
+    start = time.perf_counter()
+    path, _ = planner.plan(problem.get_start_state())
+    assert time.perf_counter() - start < 0.05
+    assert planner.last_kind == 'partial' and planner.last_bound is None
+    assert len(path) >= 2 and path[-1] == 'Stop'
+    assert planner.last_states()[0] == problem.get_start_state()
+
+
+def test_node_budget_holds_before_first_solution(tmp_path):
+    problem = budget_problem(tmp_path)
+    planner = IncrementalPlanner(problem, node_budget=200)
+    path, _ = planner.plan(problem.get_start_state())
+    assert planner.last_stats.expanded <= 200
+    assert planner.last_kind == 'partial'
+    # Kế hoạch dở không được dùng lại: lần sau tìm tiếp
+    planner.plan(problem.get_start_state())
+    assert planner.last_kind == 'partial'
@@ -0,0 +1,108 @@
+import itertools
+import random
+
+import pytest
+
+import route
+from route import held_karp, nearest_neighbour, or_opt, route_cost, solve_order, two_opt
+
+
+def instance(n, seed, with_end=True):
+    """Chi phí ngẫu nhiên không đối xứng: start -> i, i -> j, i -> end."""
+    rng = random.Random(seed)
+    start_cost = [rng.randint(1, 30) for _ in range(n)]
+    cost = [[0 if i == j else rng.randint(1, 30) for j in range(n)] for i in range(n)]
+    end_cost = [rng.randint(1, 30) for _ in range(n)] if with_end else None
+    return start_cost, cost, end_cost
+
+
+def brute_force(n, start_cost, cost, end_cost):
+    return min(route_cost(list(order), start_cost, cost, end_cost)
+               for order in itertools.permutations(range(n)))
+
+
+CASES = [(n, seed, with_end) for n in range(1, 7) for seed in range(4) for with_end in (True, False)]
+
+
+@pytest.mark.parametrize('n, seed, with_end', CASES)
+def test_held_karp_is_optimal(n, seed, with_end):
+    start_cost, cost, end_cost = instance(n, seed, with_end)
+    order, total = held_karp(n, start_cost, cost, end_cost)
+    assert sorted(order) == list(range(n))
+    assert total == route_cost(order, start_cost, cost, end_cost)
+    assert total == brute_force(n, start_cost, cost, end_cost)
+
+
+@pytest.mark.parametrize('n, seed, with_end', CASES)
+def test_two_opt_reaches_local_optimum(n, seed, with_end):
+    start_cost, cost, end_cost = instance(n, seed, with_end)
+    initial = nearest_neighbour(n, start_cost, cost)
+    before = route_cost(initial, start_cost, cost, end_cost)
+    order = two_opt(list(initial), start_cost, cost, end_cost)
+    total = route_cost(order, start_cost, cost, end_cost)
+    assert sorted(order) == list(range(n))
+    assert brute_force(n, start_cost, cost, end_cost) <= total <= before
+    # Không còn phép đảo đoạn nào làm đường ngắn hơn
+    for i in range(n):
+        for k in range(i + 1, n):
+            moved = order[:i] + order[i:k + 1][::-1] + order[k + 1:]
+            assert route_cost(moved, start_cost, cost, end_cost) >= total
+
+
+@pytest.mark.parametrize('n, seed, with_end', CASES)
+def test_or_opt_reaches_local_optimum(n, seed, with_end):
+    start_cost, cost, end_cost = instance(n, seed, with_end)
+    initial = list(range(n))
+    before = route_cost(initial, start_cost, cost, end_cost)
+    order = or_opt(initial, start_cost, cost, end_cost)
+    total = route_cost(order, start_cost, cost, end_cost)
+    assert sorted(order) == list(range(n))
+    assert brute_force(n, start_cost, cost, end_cost) <= total <= before
+    # Không còn đoạn 1..3 điểm nào chuyển chỗ (giữ hoặc đảo chiều) mà rẻ hơn
+    for length in range(1, min(3, n - 1) + 1):
+        for i in range(n - length + 1):
+            segment = order[i:i + length]
+            rest = order[:i] + order[i + length:]
+            for j in range(len(rest) + 1):
+                for piece in (segment, segment[::-1]):
+                    moved = rest[:j] + piece + rest[j:]
+                    assert route_cost(moved, start_cost, cost, end_cost) >= total
+
+
+def grid_instance(n, seed):
+    rng = random.Random(seed)
+    cells = rng.sample([(x, y) for x in range(12) for y in range(12)], n + 2)
+    return cells[0], cells[1:-1], cells[-1]
+
+
+def manhattan(a, b):
+    return abs(a[0] - b[0]) + abs(a[1] - b[1])
+
+
+def brute_force_points(start, points, end):
+    def length(order):
+        path = [start] + list(order) + [end]
+        return sum(manhattan(a, b) for a, b in zip(path, path[1:]))
+    return min(length(order) for order in itertools.permutations(points))
+
+
+@pytest.mark.parametrize('seed', range(6))
+def test_solve_order_exact_matches_brute_force(seed):
+    start, points, end = grid_instance(6, seed)
+    order, total, exact = solve_order(start, points, manhattan, end)
+    assert exact
+    assert sorted(order) == sorted(points)
+    assert total == brute_force_points(start, points, end)
+
+
+@pytest.mark.parametrize('seed', range(6))
+def test_solve_order_heuristic_is_consistent(seed, monkeypatch):
+    # Ép nhánh láng giềng gần nhất + 2-opt + Or-opt trên instance đủ nhỏ để vét cạn
+    monkeypatch.setattr(route, 'HELD_KARP_LIMIT', 3)
+    start, points, end = grid_instance(6, seed)
+    order, total, exact = solve_order(start, points, manhattan, end)
+    assert not exact
+    assert sorted(order) == sorted(points)
+    path = [start] + order + [end]
+    assert total == sum(manhattan(a, b) for a, b in zip(path, path[1:]))
+    assert total >= brute_force_points(start, points, end)